@@ -0,0 +1,36 @@
+"""Add partial indexes on active subscriptions
+
+Revision ID: subscription_active_index_001
+Revises: history_details_jsonb_001
+Create Date: 2026-10-15 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'subscription_active_index_001'
+down_revision = 'history_details_jsonb_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Only active rows are indexed, so these stay small as history accumulates.
+    # The status enum stores member names, hence 'ACTIVE'.
+    op.create_index(
+        'ix_sub_user_active', 'subscriptions', ['user_id', 'created_at'],
+        unique=False, postgresql_where=sa.text("status = 'ACTIVE'")
+    )
+    op.create_index(
+        'ix_sub_enddate_active', 'subscriptions', ['end_date'],
+        unique=False, postgresql_where=sa.text("status = 'ACTIVE'")
+    )
+    op.drop_index(op.f('ix_subscriptions_status'), table_name='subscriptions')
+
+
+def downgrade():
+    op.create_index(op.f('ix_subscriptions_status'), 'subscriptions', ['status'], unique=False)
+    op.drop_index('ix_sub_enddate_active', table_name='subscriptions')
+    op.drop_index('ix_sub_user_active', table_name='subscriptions')
@@ -0,0 +1,35 @@
+"""Set server-side default for audit_logs.created_at
+
+Revision ID: audit_log_default_001
+Revises: audit_log_index_001
+Create Date: 2026-10-15 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'audit_log_default_001'
+down_revision = 'audit_log_index_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Timestamps are generated by Postgres on insert (naive UTC, matching existing rows)
+    op.alter_column(
+        'audit_logs',
+        'created_at',
+        existing_type=sa.DateTime(),
+        server_default=sa.text("(now() at time zone 'utc')"),
+    )
+
+
+def downgrade():
+    op.alter_column(
+        'audit_logs',
+        'created_at',
+        existing_type=sa.DateTime(),
+        server_default=None,
+    )
@@ -0,0 +1,28 @@
+"""Add composite (user_id, created_at) index on audit_logs
+
+Revision ID: audit_log_index_001
+Revises: plans_001, tester_index_001
+Create Date: 2026-10-15 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'audit_log_index_001'
+down_revision = ('plans_001', 'tester_index_001')
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # User timeline queries become a single index range scan.
+    # The leading user_id column makes the single-column index redundant.
+    op.create_index('ix_audit_user_created', 'audit_logs', ['user_id', 'created_at'], unique=False)
+    op.drop_index(op.f('ix_audit_logs_user_id'), table_name='audit_logs')
+
+
+def downgrade():
+    op.create_index(op.f('ix_audit_logs_user_id'), 'audit_logs', ['user_id'], unique=False)
+    op.drop_index('ix_audit_user_created', table_name='audit_logs')
@@ -0,0 +1,26 @@
+"""Track the n8n error workflow id on n8n_instances
+
+Revision ID: error_workflow_id_001
+Revises: subhist_index_001
+Create Date: 2026-10-15 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'error_workflow_id_001'
+down_revision = 'subhist_index_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Id of the FlowDash error workflow inside the user's n8n instance, so syncs
+    # can update it directly instead of searching the instance's workflows
+    op.add_column('n8n_instances', sa.Column('n8n_error_workflow_id', sa.String(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('n8n_instances', 'n8n_error_workflow_id')
@@ -0,0 +1,31 @@
+"""Add composite (user_id, quota_type, quota_date) index on quotas
+
+Revision ID: quota_index_001
+Revises: audit_log_default_001
+Create Date: 2026-10-15 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'quota_index_001'
+down_revision = 'audit_log_default_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Daily quota lookups filter on all three columns; the composite index
+    # replaces the single-column user_id and quota_type indexes.
+    # ix_quotas_quota_date is kept for date-only scans.
+    op.create_index('ix_quotas_user_type_date', 'quotas', ['user_id', 'quota_type', 'quota_date'], unique=False)
+    op.drop_index(op.f('ix_quotas_quota_type'), table_name='quotas')
+    op.drop_index(op.f('ix_quotas_user_id'), table_name='quotas')
+
+
+def downgrade():
+    op.create_index(op.f('ix_quotas_user_id'), 'quotas', ['user_id'], unique=False)
+    op.create_index(op.f('ix_quotas_quota_type'), 'quotas', ['quota_type'], unique=False)
+    op.drop_index('ix_quotas_user_type_date', table_name='quotas')
@@ -0,0 +1,51 @@
+"""Add unique (user_id, quota_type, quota_date) constraint on quotas
+
+Revision ID: quota_unique_001
+Revises: quota_index_001
+Create Date: 2026-10-15 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'quota_unique_001'
+down_revision = 'quota_index_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Merge any duplicate daily rows (left by racing increments) into the oldest one
+    op.execute("""
+        WITH ranked AS (
+            SELECT id,
+                   SUM(COALESCE(count, 0)) OVER w AS total,
+                   ROW_NUMBER() OVER (w ORDER BY created_at, id) AS rn
+            FROM quotas
+            WINDOW w AS (PARTITION BY user_id, quota_type, quota_date)
+        )
+        UPDATE quotas SET count = ranked.total
+        FROM ranked
+        WHERE quotas.id = ranked.id AND ranked.rn = 1
+    """)
+    op.execute("""
+        WITH ranked AS (
+            SELECT id,
+                   ROW_NUMBER() OVER (PARTITION BY user_id, quota_type, quota_date ORDER BY created_at, id) AS rn
+            FROM quotas
+        )
+        DELETE FROM quotas
+        USING ranked
+        WHERE quotas.id = ranked.id AND ranked.rn > 1
+    """)
+    
+    # The constraint's unique index replaces the plain composite index
+    op.create_unique_constraint('uq_quota_daily', 'quotas', ['user_id', 'quota_type', 'quota_date'])
+    op.drop_index('ix_quotas_user_type_date', table_name='quotas')
+
+
+def downgrade():
+    op.create_index('ix_quotas_user_type_date', 'quotas', ['user_id', 'quota_type', 'quota_date'], unique=False)
+    op.drop_constraint('uq_quota_daily', 'quotas', type_='unique')
@@ -0,0 +1,62 @@
+"""Generate created_at/updated_at timestamps in Postgres
+
+Revision ID: server_timestamps_001
+Revises: uuid_ids_001
+Create Date: 2026-10-15 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'server_timestamps_001'
+down_revision = 'uuid_ids_001'
+branch_labels = None
+depends_on = None
+
+# Naive UTC, matching the values previously written by datetime.utcnow()
+UTC_NOW = sa.text("(now() at time zone 'utc')")
+
+TIMESTAMP_COLUMNS = {
+    'users': ['created_at', 'updated_at'],
+    'n8n_instances': ['created_at', 'updated_at'],
+    'plans': ['created_at', 'updated_at'],
+    'quotas': ['created_at', 'updated_at'],
+    'subscriptions': ['created_at', 'updated_at'],
+    'subscription_history': ['created_at'],
+    'audit_logs': ['created_at'],
+}
+
+# Server defaults that existed before this revision (restored on downgrade)
+PREVIOUS_DEFAULTS = {
+    'plans': sa.text('now()'),
+    'audit_logs': UTC_NOW,
+}
+
+
+def upgrade():
+    for table, columns in TIMESTAMP_COLUMNS.items():
+        for column in columns:
+            op.execute(
+                f"UPDATE {table} SET {column} = (now() at time zone 'utc') WHERE {column} IS NULL"
+            )
+            op.alter_column(
+                table,
+                column,
+                existing_type=sa.DateTime(),
+                server_default=UTC_NOW,
+                nullable=False,
+            )
+
+
+def downgrade():
+    for table, columns in TIMESTAMP_COLUMNS.items():
+        for column in columns:
+            op.alter_column(
+                table,
+                column,
+                existing_type=sa.DateTime(),
+                server_default=PREVIOUS_DEFAULTS.get(table),
+                nullable=True,
+            )
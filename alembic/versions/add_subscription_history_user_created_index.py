@@ -0,0 +1,33 @@
+"""Add (user_id, created_at DESC) index on subscription_history
+
+Revision ID: subhist_index_001
+Revises: server_timestamps_001
+Create Date: 2026-10-15 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'subhist_index_001'
+down_revision = 'server_timestamps_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Serves "history for user, newest first" in index order.
+    # Replaces the single-column user_id and created_at indexes.
+    op.create_index(
+        'ix_subhist_user_created', 'subscription_history',
+        ['user_id', sa.text('created_at DESC')], unique=False
+    )
+    op.drop_index(op.f('ix_subscription_history_user_id'), table_name='subscription_history')
+    op.drop_index(op.f('ix_subscription_history_created_at'), table_name='subscription_history')
+
+
+def downgrade():
+    op.create_index(op.f('ix_subscription_history_created_at'), 'subscription_history', ['created_at'], unique=False)
+    op.create_index(op.f('ix_subscription_history_user_id'), 'subscription_history', ['user_id'], unique=False)
+    op.drop_index('ix_subhist_user_created', table_name='subscription_history')
@@ -0,0 +1,32 @@
+"""Track each user's n8n instance count on users
+
+Revision ID: user_instance_count_001
+Revises: error_workflow_id_001
+Create Date: 2026-10-15 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'user_instance_count_001'
+down_revision = 'error_workflow_id_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Denormalized count for the plan-limit check on instance creation,
+    # so creating an instance no longer counts n8n_instances
+    op.add_column('users', sa.Column('instance_count', sa.Integer(), nullable=False, server_default='0'))
+    op.execute("""
+        UPDATE users
+        SET instance_count = (
+            SELECT COUNT(*) FROM n8n_instances WHERE n8n_instances.user_id = users.id
+        )
+    """)
+
+
+def downgrade():
+    op.drop_column('users', 'instance_count')
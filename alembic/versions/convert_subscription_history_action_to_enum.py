@@ -0,0 +1,32 @@
+"""Convert subscription_history.action to a native enum
+
+Revision ID: history_action_enum_001
+Revises: quota_unique_001
+Create Date: 2026-10-15 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'history_action_enum_001'
+down_revision = 'quota_unique_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE TYPE history_action AS ENUM ('created', 'upgraded', 'cancelled', 'renewed', 'expired')")
+    op.execute(
+        "ALTER TABLE subscription_history "
+        "ALTER COLUMN action TYPE history_action USING action::history_action"
+    )
+
+
+def downgrade():
+    op.execute(
+        "ALTER TABLE subscription_history "
+        "ALTER COLUMN action TYPE VARCHAR USING action::text"
+    )
+    op.execute("DROP TYPE history_action")
@@ -0,0 +1,39 @@
+"""Convert subscription_history.details from JSON text to JSONB
+
+Revision ID: history_details_jsonb_001
+Revises: history_action_enum_001
+Create Date: 2026-10-15 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'history_details_jsonb_001'
+down_revision = 'history_action_enum_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.alter_column(
+        'subscription_history',
+        'details',
+        existing_type=sa.Text(),
+        type_=postgresql.JSONB(),
+        postgresql_using='details::jsonb',
+        existing_nullable=True,
+    )
+
+
+def downgrade():
+    op.alter_column(
+        'subscription_history',
+        'details',
+        existing_type=postgresql.JSONB(),
+        type_=sa.Text(),
+        postgresql_using='details::text',
+        existing_nullable=True,
+    )
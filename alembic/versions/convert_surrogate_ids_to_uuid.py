@@ -0,0 +1,47 @@
+"""Store server-generated surrogate ids as native uuid
+
+Revision ID: uuid_ids_001
+Revises: subscription_active_index_001
+Create Date: 2026-10-15 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'uuid_ids_001'
+down_revision = 'subscription_active_index_001'
+branch_labels = None
+depends_on = None
+
+# Tables whose ids are generated server-side and not referenced by foreign keys
+TABLES = ['quotas', 'subscription_history', 'audit_logs']
+
+
+def upgrade():
+    for table in TABLES:
+        # The primary key already has its own index; the extra ix_<table>_id is redundant
+        op.drop_index(op.f(f'ix_{table}_id'), table_name=table)
+        op.alter_column(
+            table,
+            'id',
+            existing_type=sa.String(),
+            type_=postgresql.UUID(as_uuid=True),
+            postgresql_using='id::uuid',
+            existing_nullable=False,
+        )
+
+
+def downgrade():
+    for table in TABLES:
+        op.alter_column(
+            table,
+            'id',
+            existing_type=postgresql.UUID(as_uuid=True),
+            type_=sa.String(),
+            postgresql_using='id::text',
+            existing_nullable=False,
+        )
+        op.create_index(op.f(f'ix_{table}_id'), table, ['id'], unique=False)
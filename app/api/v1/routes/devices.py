@@ -40,7 +40,7 @@ async def register_device(
             )
         
         # Register device
-        device_service.register_device(
+        await device_service.register_device(
             user_id=current_user['uid'],
             device_id=request.device_id,
             fcm_token=request.fcm_token,
@@ -95,7 +95,7 @@ async def delete_device(
     
     try:
         # Delete device
-        device_service.delete_device(
+        await device_service.delete_device(
             user_id=current_user['uid'],
             device_id=request.device_id
         )
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field, ConfigDict
+from datetime import datetime
 from app.core.middleware import get_current_user
 from app.core.database import get_db
 from app.services.instance_service import InstanceService
@@ -29,6 +30,23 @@ class InstanceUpdate(BaseModel):
     enabled: bool | None = None  # Optional: update enabled state
 
 
+class InstanceResponse(BaseModel):
+    """Instance fields returned by the API (the encrypted API key is never included)"""
+    model_config = ConfigDict(from_attributes=True)
+    
+    id: str
+    user_id: str
+    name: str
+    url: str
+    enabled: bool
+    created_at: datetime
+    updated_at: datetime
+
+
+class InstanceListResponse(BaseModel):
+    instances: list[InstanceResponse]
+
+
 async def _list_instances(
     current_user: dict,
     db: Session,
@@ -46,8 +64,8 @@ async def _list_instances(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("")
-@router.get("/")
+@router.get("", response_model=InstanceListResponse)
+@router.get("/", response_model=InstanceListResponse)
 async def list_instances(
     current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db),
@@ -81,8 +99,8 @@ async def _create_instance(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("")
-@router.post("/")
+@router.post("", response_model=InstanceResponse)
+@router.post("/", response_model=InstanceResponse)
 async def create_instance(
     instance_data: InstanceCreate,
     current_user: dict = Depends(get_current_user),
@@ -92,7 +110,7 @@ async def create_instance(
     return await _create_instance(instance_data, current_user, db)
 
 
-@router.get("/{instance_id}")
+@router.get("/{instance_id}", response_model=InstanceResponse)
 async def get_instance(
     instance_id: str,
     current_user: dict = Depends(get_current_user),
@@ -113,7 +131,7 @@ async def get_instance(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.put("/{instance_id}")
+@router.put("/{instance_id}", response_model=InstanceResponse)
 async def update_instance(
     instance_id: str,
     instance_data: InstanceUpdate,
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
@@ -14,6 +14,10 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# Current time as naive UTC, evaluated by Postgres. Used as the server-side default
+# for created_at/updated_at columns (which store naive UTC timestamps).
+UTC_NOW = text("(now() at time zone 'utc')")
+
 
 def get_db():
     db = SessionLocal()
@@ -1,12 +1,17 @@
 import firebase_admin
-from firebase_admin import credentials, auth, firestore
+from firebase_admin import credentials, auth, firestore, firestore_async
 from app.core.config import settings
 import logging
+import threading
 from google.auth.transport.requests import Request
 from google.oauth2 import service_account
 
 logger = logging.getLogger(__name__)
 
+# FCM service account credentials, reused while their access token is valid
+_fcm_credentials = None
+_fcm_credentials_lock = threading.Lock()
+
 
 def init_firebase():
     """Initialize Firebase Admin SDK"""
@@ -44,24 +49,34 @@ def get_firestore_client():
     return firestore.client()
 
 
+def get_async_firestore_client():
+    """Get async Firestore client instance (shared per app by firebase_admin)"""
+    return firestore_async.client()
+
+
 def get_fcm_access_token() -> str:
-    """Get OAuth2 access token for FCM using Firebase Admin credentials"""
-    logger.info("get_fcm_access_token: Entry")
+    """Get OAuth2 access token for FCM using Firebase Admin credentials
+    
+    The credentials are kept between calls and only refreshed when their token
+    has expired (Google tokens last about an hour).
+    """
+    global _fcm_credentials
     
     try:
-        # Create service account credentials from Firebase credentials file
-        creds = service_account.Credentials.from_service_account_file(
-            settings.firebase_credentials_path,
-            scopes=['https://www.googleapis.com/auth/firebase.messaging']
-        )
-        
-        # Refresh the credentials to get an access token
-        creds.refresh(Request())
-        
-        token = creds.token
-        logger.info("get_fcm_access_token: Success")
-        return token
+        with _fcm_credentials_lock:
+            if _fcm_credentials is None:
+                # Create service account credentials from Firebase credentials file
+                _fcm_credentials = service_account.Credentials.from_service_account_file(
+                    settings.firebase_credentials_path,
+                    scopes=['https://www.googleapis.com/auth/firebase.messaging']
+                )
+            
+            if not _fcm_credentials.valid:
+                logger.info("get_fcm_access_token: Refreshing token")
+                # Refresh the credentials to get an access token
+                _fcm_credentials.refresh(Request())
+            
+            return _fcm_credentials.token
     except Exception as e:
         logger.error(f"get_fcm_access_token: Failure - {e}")
         raise
-
@@ -6,8 +6,11 @@ from app.core.firebase import verify_firebase_token
 from app.core.database import get_db
 from app.models.user import User
 from app.core.cache import get_cache
+from app.core.redis_cache import RedisCache
 from datetime import datetime, timedelta
+from typing import Optional
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +32,67 @@ DEFAULT_IP_LIMITS = {
     'per_hour': 500,
 }
 
+# Number of locally counted requests per key before syncing to Redis
+LOCAL_SYNC_EVERY = 10
+
+
+class LocalRateCounter:
+    """
+    Per-process request counter for a single rate limit window (minute or hour).
+    
+    Requests are counted in memory and pushed to Redis in one INCRBY every
+    LOCAL_SYNC_EVERY requests per key, so most requests cost a dict increment
+    instead of a network call. The count for a key is the last total seen in
+    Redis plus the requests not yet synced. Entries are dropped when the window
+    rolls over.
+    """
+    
+    def __init__(self, cache: RedisCache, ttl_seconds: int):
+        self.cache = cache
+        self.ttl_seconds = ttl_seconds
+        self._window: Optional[str] = None
+        self._counts: dict[str, list[int]] = {}  # key -> [synced_total, pending]
+        self._lock = threading.Lock()
+    
+    def _roll(self, window: str):
+        """Reset local state when the window changes (caller holds the lock)"""
+        if window != self._window:
+            self._counts.clear()
+            self._window = window
+    
+    def count(self, key: str, window: str) -> int:
+        """Get the estimated request count for key in the current window"""
+        with self._lock:
+            self._roll(window)
+            entry = self._counts.get(key)
+            return entry[0] + entry[1] if entry else 0
+    
+    def hit(self, key: str, window: str) -> int:
+        """Record a request and return the estimated count including it"""
+        with self._lock:
+            self._roll(window)
+            entry = self._counts.get(key)
+            # The first request for a key in this process syncs immediately
+            # so the local count starts from the global total
+            is_first = entry is None
+            if is_first:
+                entry = self._counts[key] = [0, 0]
+            entry[1] += 1
+            if not is_first and entry[1] < LOCAL_SYNC_EVERY:
+                return entry[0] + entry[1]
+            pending = entry[1]
+            entry[1] = 0
+        
+        total = self.cache.incr_with_ttl(key, pending, self.ttl_seconds)
+        
+        with self._lock:
+            if total is None:
+                # Redis unavailable - keep limiting on the local count only
+                entry[0] += pending
+            else:
+                entry[0] = max(entry[0] + pending, total)
+            return entry[0] + entry[1]
+
 
 class RateLimitMiddleware(BaseHTTPMiddleware):
     """
@@ -39,6 +103,8 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
     def __init__(self, app: ASGIApp):
         super().__init__(app)
         self.cache = get_cache()
+        self.minute_counter = LocalRateCounter(self.cache, ttl_seconds=60)
+        self.hour_counter = LocalRateCounter(self.cache, ttl_seconds=3600)
     
     async def dispatch(self, request: Request, call_next):
         # Skip rate limiting for health check and other public endpoints
@@ -156,67 +222,64 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
     def _check_user_rate_limit(self, user_id: str, user_plan: str, request: Request) -> bool:
         """Check if user is within rate limits for their plan"""
         limits = RATE_LIMITS.get(user_plan, RATE_LIMITS['free'])
+        now = datetime.utcnow()
         
         # Check per-minute limit
-        current_minute = datetime.utcnow().replace(second=0, microsecond=0)
-        minute_key = f"rate_limit:user:{user_id}:minute:{current_minute.isoformat()}"
-        minute_count = self.cache.get_int(minute_key) or 0
+        minute_window = now.replace(second=0, microsecond=0).isoformat()
+        minute_key = f"rate_limit:user:{user_id}:minute:{minute_window}"
         
-        if minute_count >= limits['per_minute']:
+        if self.minute_counter.count(minute_key, minute_window) >= limits['per_minute']:
             logger.warning(f"Rate limit exceeded (per minute) - user: {user_id}, plan: {user_plan}")
             return False
         
         # Check per-hour limit (if not unlimited)
         if limits['per_hour'] > 0:
-            current_hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
-            hour_key = f"rate_limit:user:{user_id}:hour:{current_hour.isoformat()}"
-            hour_count = self.cache.get_int(hour_key) or 0
+            hour_window = now.replace(minute=0, second=0, microsecond=0).isoformat()
+            hour_key = f"rate_limit:user:{user_id}:hour:{hour_window}"
             
-            if hour_count >= limits['per_hour']:
+            if self.hour_counter.count(hour_key, hour_window) >= limits['per_hour']:
                 logger.warning(f"Rate limit exceeded (per hour) - user: {user_id}, plan: {user_plan}")
                 return False
             
             # Increment hour counter
-            self.cache.set(hour_key, hour_count + 1, ttl_minutes=60)
+            self.hour_counter.hit(hour_key, hour_window)
         
         # Increment minute counter
-        self.cache.set(minute_key, minute_count + 1, ttl_minutes=1)
+        self.minute_counter.hit(minute_key, minute_window)
         
         return True
     
     def _check_ip_rate_limit(self, client_ip: str, request: Request) -> bool:
         """Check if IP address is within rate limits"""
         limits = DEFAULT_IP_LIMITS
+        now = datetime.utcnow()
         
         # Check per-minute limit
-        current_minute = datetime.utcnow().replace(second=0, microsecond=0)
-        minute_key = f"rate_limit:ip:{client_ip}:minute:{current_minute.isoformat()}"
-        minute_count = self.cache.get_int(minute_key) or 0
+        minute_window = now.replace(second=0, microsecond=0).isoformat()
+        minute_key = f"rate_limit:ip:{client_ip}:minute:{minute_window}"
         
-        if minute_count >= limits['per_minute']:
+        if self.minute_counter.count(minute_key, minute_window) >= limits['per_minute']:
             logger.warning(f"Rate limit exceeded (per minute) - IP: {client_ip}")
             return False
         
         # Check per-hour limit
-        current_hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
-        hour_key = f"rate_limit:ip:{client_ip}:hour:{current_hour.isoformat()}"
-        hour_count = self.cache.get_int(hour_key) or 0
+        hour_window = now.replace(minute=0, second=0, microsecond=0).isoformat()
+        hour_key = f"rate_limit:ip:{client_ip}:hour:{hour_window}"
         
-        if hour_count >= limits['per_hour']:
+        if self.hour_counter.count(hour_key, hour_window) >= limits['per_hour']:
             logger.warning(f"Rate limit exceeded (per hour) - IP: {client_ip}")
             return False
         
         # Increment counters
-        self.cache.set(minute_key, minute_count + 1, ttl_minutes=1)
-        self.cache.set(hour_key, hour_count + 1, ttl_minutes=60)
+        self.minute_counter.hit(minute_key, minute_window)
+        self.hour_counter.hit(hour_key, hour_window)
         
         return True
     
     def _get_remaining_requests(self, user_id: str, user_plan: str) -> int:
         """Get remaining requests for the current minute"""
         limits = RATE_LIMITS.get(user_plan, RATE_LIMITS['free'])
-        current_minute = datetime.utcnow().replace(second=0, microsecond=0)
-        minute_key = f"rate_limit:user:{user_id}:minute:{current_minute.isoformat()}"
-        minute_count = self.cache.get_int(minute_key) or 0
+        minute_window = datetime.utcnow().replace(second=0, microsecond=0).isoformat()
+        minute_key = f"rate_limit:user:{user_id}:minute:{minute_window}"
+        minute_count = self.minute_counter.count(minute_key, minute_window)
         return max(0, limits['per_minute'] - minute_count - 1)
-
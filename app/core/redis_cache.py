@@ -1,14 +1,33 @@
-import json
 import logging
+import socket
+import time
 import uuid
 from typing import Optional, Dict, Any
-from datetime import datetime
+import orjson
 import redis
-from redis.exceptions import RedisError, ConnectionError as RedisConnectionError
+from redis.backoff import ExponentialBackoff
+from redis.connection import HIREDIS_AVAILABLE, _HiredisParser
+from redis.exceptions import RedisError, ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+from redis.retry import Retry
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+if not HIREDIS_AVAILABLE:
+    logger.warning("RedisCache: hiredis not installed, falling back to pure-Python reply parser")
+
+# TCP keepalive probes: start after 60s idle, every 10s, give up after 3 misses
+# (only the options supported by the current platform are set)
+KEEPALIVE_OPTIONS = {
+    option: value
+    for option, value in (
+        (getattr(socket, 'TCP_KEEPIDLE', None), 60),
+        (getattr(socket, 'TCP_KEEPINTVL', None), 10),
+        (getattr(socket, 'TCP_KEEPCNT', None), 3),
+    )
+    if option is not None
+}
+
 
 class RedisCache:
     """Redis-backed cache for rate limiting and n8n API responses"""
@@ -116,18 +135,32 @@ class RedisCache:
         if self._connecting:
             raise RuntimeError("Redis connection already in progress")
         
+        # Stale sockets are caught by the pool's health checks and retry policy,
+        # and failed operations reset _connected, so no ping is needed here
         if self._connected and self._client is not None:
-            # Quick check if connection is still alive
-            try:
-                self._client.ping()
-                return
-            except (RedisError, AttributeError):
-                # Connection lost, reconnect
-                self._connected = False
-                self._client = None
+            return
         
-        if not self._connected:
-            self._connect()
+        self._connect()
+    
+    def _get_client_options(self) -> Dict[str, Any]:
+        """Get connection options shared by URL-based and host/port-based clients"""
+        options = {
+            'decode_responses': False,
+            'socket_connect_timeout': 2,
+            'socket_timeout': 2,
+            # Keep idle sockets alive so the next request doesn't pay a reconnect
+            'socket_keepalive': True,
+            'socket_keepalive_options': KEEPALIVE_OPTIONS,
+            # redis-py checks connections idle for longer than this before reuse
+            'health_check_interval': 30,
+            # Transparently retry transient connection resets and timeouts
+            'retry': Retry(ExponentialBackoff(cap=0.1, base=0.01), 3),
+            'retry_on_error': [RedisConnectionError, RedisTimeoutError],
+        }
+        if HIREDIS_AVAILABLE:
+            # Parse replies in C; values stay raw bytes for orjson
+            options['parser_class'] = _HiredisParser
+        return options
     
     def _connect(self):
         """Connect to Redis server"""
@@ -150,13 +183,7 @@ class RedisCache:
                 if redis_url and 'redis_url' in params:
                     # Use redis.from_url() for proper URL parsing
                     # Override password if settings.redis_password is set (takes precedence)
-                    client_kwargs = {
-                        'decode_responses': False,
-                        'socket_connect_timeout': 2,
-                        'socket_timeout': 2,
-                        'retry_on_timeout': False,
-                        'health_check_interval': 0,
-                    }
+                    client_kwargs = self._get_client_options()
                     # Override password from settings if provided (takes precedence over URL password)
                     if redis_password:
                         client_kwargs['password'] = redis_password
@@ -164,17 +191,15 @@ class RedisCache:
                     self._client = redis.from_url(redis_url, **client_kwargs)
                 else:
                     # Use individual connection parameters
-                    self._client = redis.Redis(
-                        host=params['host'],
-                        port=params['port'],
-                        db=params['db'],
-                        password=params['password'],
-                        decode_responses=False,
-                        socket_connect_timeout=2,  # Shorter timeout
-                        socket_timeout=2,
-                        retry_on_timeout=False,  # Disable retry to avoid recursion
-                        health_check_interval=0,  # Disable health check
-                    )
+                    pool_kwargs = {
+                        'host': params['host'],
+                        'port': params['port'],
+                        'db': params['db'],
+                        'password': params['password'],
+                        **self._get_client_options(),
+                    }
+                    # Parser and retry settings are connection options, so they go through the pool
+                    self._client = redis.Redis(connection_pool=redis.ConnectionPool(**pool_kwargs))
             except RecursionError as e:
                 logger.error(f"RedisCache: Recursion error while creating Redis client - {e}")
                 self._connected = False
@@ -245,12 +270,12 @@ class RedisCache:
                 logger.debug(f"Cache miss: {key}")
                 return None
             
-            # Deserialize JSON
+            # Deserialize JSON straight from the raw reply bytes
             try:
-                decoded = json.loads(data.decode('utf-8'))
+                decoded = orjson.loads(data)
                 logger.debug(f"Cache hit: {key}")
                 return decoded
-            except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            except orjson.JSONDecodeError as e:
                 logger.warning(f"RedisCache: Failed to decode value for key {key}: {e}")
                 # Delete corrupted entry
                 self._client.delete(key)
@@ -279,19 +304,19 @@ class RedisCache:
             if data is None:
                 return None
             
-            # Try to decode as integer directly
+            # Try to decode as integer directly (int() accepts ASCII bytes)
             try:
-                return int(data.decode('utf-8'))
-            except (ValueError, UnicodeDecodeError):
+                return int(data)
+            except ValueError:
                 # If not a simple integer, try JSON decode
                 try:
-                    decoded = json.loads(data.decode('utf-8'))
+                    decoded = orjson.loads(data)
                     if isinstance(decoded, int):
                         return decoded
                     if isinstance(decoded, dict) and 'count' in decoded:
                         return decoded['count']
                     return None
-                except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                except orjson.JSONDecodeError as e:
                     logger.warning(f"RedisCache: Failed to decode integer for key {key}: {e}")
                     self._client.delete(key)
                     return None
@@ -317,14 +342,7 @@ class RedisCache:
         try:
             # Convert TTL from minutes to seconds
             ttl_seconds = ttl_minutes * 60
-            
-            # Serialize value
-            if isinstance(value, int):
-                # Store integers as strings for efficiency
-                serialized = str(value).encode('utf-8')
-            else:
-                # Store dicts as JSON
-                serialized = json.dumps(value).encode('utf-8')
+            serialized = self._serialize(value)
             
             # Set with TTL
             self._client.setex(key, ttl_seconds, serialized)
@@ -334,6 +352,14 @@ class RedisCache:
             # Reset connection state on error
             self._connected = False
     
+    def _serialize(self, value: Dict | int) -> bytes:
+        """Serialize a cache value (integers as plain strings, dicts as JSON)"""
+        if isinstance(value, int):
+            # Store integers as strings for efficiency
+            return str(value).encode('utf-8')
+        # Store dicts as JSON
+        return orjson.dumps(value)
+    
     def delete(self, key: str):
         """Delete cache entry"""
         try:
@@ -401,7 +427,10 @@ class RedisCache:
                 return False
             self._client.ping()
             return True
-        except (RedisError, RuntimeError, RecursionError):
+        except RedisError:
+            self._connected = False
+            return False
+        except (RuntimeError, RecursionError):
             return False
     
     def acquire_lock(self, lock_key: str, timeout_seconds: int = 10, block_seconds: int = 5) -> bool:
@@ -424,10 +453,11 @@ class RedisCache:
             
             # Try to acquire lock with SET NX EX (atomic operation)
             # Returns True if key was set (lock acquired), False if key already exists
-            end_time = datetime.utcnow().timestamp() + block_seconds
+            # Monotonic clock: cheap to read and immune to wall-clock jumps
+            deadline = time.monotonic() + block_seconds
             lock_value = str(uuid.uuid4())  # Unique value to identify our lock
             
-            while datetime.utcnow().timestamp() < end_time:
+            while time.monotonic() < deadline:
                 # SET key value NX EX timeout - atomic operation
                 acquired = self._client.set(
                     lock_key,
@@ -441,7 +471,6 @@ class RedisCache:
                     return True
                 
                 # Wait a bit before retrying
-                import time
                 time.sleep(0.05)  # 50ms
             
             logger.debug(f"RedisCache: Failed to acquire lock - {lock_key}")
@@ -498,6 +527,36 @@ class RedisCache:
             self._connected = False
             return None
     
+    def incr_with_ttl(self, key: str, amount: int, ttl_seconds: int) -> Optional[int]:
+        """
+        Atomically increment a counter and (re)set its expiration in one round-trip.
+        
+        Args:
+            key: The key to increment
+            amount: Amount to increment by
+            ttl_seconds: Number of seconds until expiration
+        
+        Returns:
+            The new value after increment, or None if Redis unavailable
+        """
+        try:
+            self._ensure_connected()
+            if self._client is None:
+                logger.warning(f"RedisCache: Cannot increment key {key} - Redis not available")
+                return None
+            
+            with self._client.pipeline(transaction=True) as pipe:
+                pipe.incrby(key, amount)
+                pipe.expire(key, ttl_seconds)
+                new_value, _ = pipe.execute()
+            logger.debug(f"RedisCache: Incremented {key} by {amount} to {new_value}, TTL: {ttl_seconds}s")
+            return new_value
+            
+        except RedisError as e:
+            logger.error(f"RedisCache: Error incrementing key {key}: {e}")
+            self._connected = False
+            return None
+    
     def expire(self, key: str, seconds: int):
         """
         Set expiration time on a key.
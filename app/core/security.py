@@ -1,12 +1,18 @@
 from cryptography.fernet import Fernet
 from app.core.config import settings
+from functools import lru_cache
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-def get_cipher():
-    """Get Fernet cipher instance for encryption/decryption"""
+@lru_cache(maxsize=1)
+def get_cipher() -> Fernet:
+    """Get Fernet cipher instance for encryption/decryption.
+
+    The key is decoded and split into signing/encryption halves once,
+    on first use, and the cipher is reused for the life of the process.
+    """
     key = settings.encryption_key.encode()
     return Fernet(key)
 
@@ -25,15 +31,24 @@ def encrypt_api_key(api_key: str) -> str:
         raise
 
 
+@lru_cache(maxsize=1024)
+def _decrypt_cached(encrypted_key: str) -> str:
+    """Decrypt a stored key once per process.
+
+    Keyed on the ciphertext: re-encrypting or rotating a key stores a new
+    ciphertext, so cached entries never go stale. Failures are not cached.
+    """
+    return get_cipher().decrypt(encrypted_key.encode()).decode()
+
+
 def decrypt_api_key(encrypted_key: str) -> str:
     """Decrypt n8n API key from database"""
     logger.info("decrypt_api_key: Entry")
     
     try:
-        cipher = get_cipher()
-        decrypted = cipher.decrypt(encrypted_key.encode())
+        decrypted = _decrypt_cached(encrypted_key)
         logger.info("decrypt_api_key: Success")
-        return decrypted.decode()
+        return decrypted
     except Exception as e:
         logger.error(f"decrypt_api_key: Failure - {e}")
         raise
@@ -5,6 +5,11 @@ from app.core.firebase import init_firebase
 from app.core.database import engine, Base
 from app.core.rate_limit_middleware import RateLimitMiddleware
 from app.api.v1.router import api_router
+from app.services.analytics_service import ANALYTICS_FLUSH_TIMEOUT_SECONDS, analytics_worker
+from app.services.error_workflow_service import close_n8n_client
+from app.services.fcm_service import close_fcm_client
+from functools import lru_cache
+import asyncio
 import logging
 import os
 
@@ -12,6 +17,7 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=1)
 def get_version() -> str:
     """Read version from VERSION file, fallback to default if not found."""
     version_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), "VERSION")
@@ -41,9 +47,11 @@ app = FastAPI(
 )
 
 # Add CORS middleware (must be first, before rate limiting)
+# A frozenset makes the per-request origin check a hash lookup;
+# "*" is still detected by Starlette and short-circuits to allow-all
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=settings.cors_origins,
+    allow_origins=frozenset(settings.cors_origins),
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -56,6 +64,29 @@ app.add_middleware(RateLimitMiddleware)
 app.include_router(api_router, prefix=settings.api_v1_str)
 
 
+@app.on_event("startup")
+async def start_analytics_worker():
+    analytics_worker.start()
+
+
+@app.on_event("shutdown")
+async def flush_analytics_worker():
+    # Write out events still queued before the process exits. The wait is bounded and
+    # runs in a thread, so a slow Firestore neither blocks the event loop nor the
+    # shutdown hooks after this one
+    await asyncio.to_thread(analytics_worker.flush, ANALYTICS_FLUSH_TIMEOUT_SECONDS)
+
+
+@app.on_event("shutdown")
+async def close_n8n_http_client():
+    await close_n8n_client()
+
+
+@app.on_event("shutdown")
+async def close_fcm_http_client():
+    await close_fcm_client()
+
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
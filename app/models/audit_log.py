@@ -1,19 +1,24 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Index
+from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
-from app.core.database import Base
-from datetime import datetime
+from app.core.database import Base, UTC_NOW
+from app.core.ids import uuid7
 
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"
+    __table_args__ = (
+        # User timeline queries: single index range scan (also covers user_id lookups)
+        Index("ix_audit_user_created", "user_id", "created_at"),
+    )
     
-    id = Column(String, primary_key=True, index=True)
-    user_id = Column(String, ForeignKey("users.id"), nullable=False, index=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)  # Time-ordered UUIDv7, stored as native uuid
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
     action = Column(String, nullable=False, index=True)  # 'toggle_workflow', 'view_error', etc.
     resource_type = Column(String, nullable=False)  # 'workflow', 'instance', etc.
     resource_id = Column(String, nullable=True)
     meta_data = Column(Text)  # JSON string for additional data
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    created_at = Column(DateTime, server_default=UTC_NOW, nullable=False, index=True)
     
     # Relationships
     user = relationship("User")
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Literal, Optional, Dict, Any
 
 
@@ -27,8 +27,9 @@ class FCMNotificationData(BaseModel):
         description="Notification body (for data-only notifications)"
     )
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        frozen=True,
+        json_schema_extra={
             "example": {
                 "type": "workflow_error",
                 "workflow_id": "abc123",
@@ -39,6 +40,7 @@ class FCMNotificationData(BaseModel):
                 "workflow_name": "Data Sync Workflow"
             }
         }
+    )
 
 
 class FCMNotificationPayload(BaseModel):
@@ -46,17 +48,21 @@ class FCMNotificationPayload(BaseModel):
     title: str = Field(description="Notification title")
     body: str = Field(description="Notification body text")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        frozen=True,
+        json_schema_extra={
             "example": {
                 "title": "n8n Workflow Error",
                 "body": "Workflow abc123 failed: Connection timeout"
             }
         }
+    )
 
 
 class FCMAndroidConfig(BaseModel):
     """Android-specific FCM configuration"""
+    model_config = ConfigDict(frozen=True)
+    
     priority: Literal["normal", "high"] = Field(default="high")
     notification: Optional[Dict[str, str]] = Field(
         default=None,
@@ -66,12 +72,14 @@ class FCMAndroidConfig(BaseModel):
 
 class FCMApnsConfig(BaseModel):
     """iOS APNS-specific FCM configuration"""
+    model_config = ConfigDict(frozen=True)
+    
     headers: Dict[str, str] = Field(
-        default={"apns-priority": "10"},
+        default_factory=lambda: {"apns-priority": "10"},
         description="APNS headers"
     )
     payload: Dict[str, Any] = Field(
-        default={
+        default_factory=lambda: {
             "aps": {
                 "sound": "default",
                 "badge": 1
@@ -81,6 +89,12 @@ class FCMApnsConfig(BaseModel):
     )
 
 
+# Shared default platform configs. The models are frozen, so FCMMessage can hand
+# out the same instance instead of building (and deep-copying) new ones per message.
+DEFAULT_ANDROID_CONFIG = FCMAndroidConfig()
+DEFAULT_APNS_CONFIG = FCMApnsConfig()
+
+
 class FCMMessage(BaseModel):
     """Complete FCM message structure"""
     token: str = Field(description="FCM device token")
@@ -89,11 +103,13 @@ class FCMMessage(BaseModel):
         description="Notification payload (optional - use None for data-only notifications)"
     )
     data: Dict[str, str] = Field(description="Custom data payload as string key-value pairs")
-    android: FCMAndroidConfig = Field(default_factory=FCMAndroidConfig)
-    apns: FCMApnsConfig = Field(default_factory=FCMApnsConfig)
+    # default_factory (not default=) so pydantic returns the shared instance uncopied
+    android: FCMAndroidConfig = Field(default_factory=lambda: DEFAULT_ANDROID_CONFIG)
+    apns: FCMApnsConfig = Field(default_factory=lambda: DEFAULT_APNS_CONFIG)
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        frozen=True,
+        json_schema_extra={
             "example": {
                 "token": "fcm_device_token_here",
                 "notification": {
@@ -127,5 +143,4 @@ class FCMMessage(BaseModel):
                 }
             }
         }
-
-
+    )
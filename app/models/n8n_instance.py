@@ -1,7 +1,6 @@
 from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Boolean
-from sqlalchemy.orm import relationship
-from app.core.database import Base
-from datetime import datetime
+from sqlalchemy.orm import deferred, relationship
+from app.core.database import Base, UTC_NOW
 
 
 class N8NInstance(Base):
@@ -11,11 +10,14 @@ class N8NInstance(Base):
     user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     name = Column(String, nullable=False)
     url = Column(String, nullable=False)
-    api_key_encrypted = Column(Text, nullable=False)  # Encrypted API key
+    # Encrypted API key. Deferred: only loaded by queries that call n8n (undefer it there)
+    api_key_encrypted = deferred(Column(Text, nullable=False))
     enabled = Column(Boolean, default=True, nullable=False)  # Enable/disable instance
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    n8n_error_workflow_id = Column(String, nullable=True)  # FlowDash error workflow in the user's n8n, set by the first sync
+    created_at = Column(DateTime, server_default=UTC_NOW, nullable=False)
+    updated_at = Column(DateTime, server_default=UTC_NOW, onupdate=UTC_NOW, nullable=False)
     
     # Relationships
-    user = relationship("User", back_populates="n8n_instances")
+    # Not loaded implicitly: queries that need the owner opt in with joinedload/selectinload
+    user = relationship("User", back_populates="n8n_instances", lazy="raise")
 
@@ -1,7 +1,6 @@
 from sqlalchemy import Column, String, DateTime, Boolean, Numeric, JSON
 from sqlalchemy.orm import relationship
-from app.core.database import Base
-from datetime import datetime
+from app.core.database import Base, UTC_NOW
 
 
 class Plan(Base):
@@ -15,6 +14,6 @@ class Plan(Base):
     features = Column(JSON, nullable=False)  # Store as array
     active = Column(Boolean, default=True, nullable=False)
     recommended = Column(Boolean, default=False, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=UTC_NOW, nullable=False)
+    updated_at = Column(DateTime, server_default=UTC_NOW, onupdate=UTC_NOW, nullable=False)
 
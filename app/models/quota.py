@@ -1,19 +1,26 @@
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Date
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Date, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
-from app.core.database import Base
-from datetime import datetime, date
+from app.core.database import Base, UTC_NOW
+from datetime import date
+import uuid
 
 
 class Quota(Base):
     __tablename__ = "quotas"
+    __table_args__ = (
+        # One row per user, type and day. Backs the ON CONFLICT upsert, and its index
+        # serves daily quota lookups (the user_id prefix also serves per-user lookups)
+        UniqueConstraint("user_id", "quota_type", "quota_date", name="uq_quota_daily"),
+    )
     
-    id = Column(String, primary_key=True, index=True)
-    user_id = Column(String, ForeignKey("users.id"), nullable=False, index=True)
-    quota_type = Column(String, nullable=False, index=True)  # 'toggles', 'refreshes', 'error_views', etc.
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)  # 16-byte native uuid
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    quota_type = Column(String, nullable=False)  # 'toggles', 'refreshes', 'error_views', etc.
     count = Column(Integer, default=0)
     quota_date = Column(Date, default=date.today, index=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=UTC_NOW, nullable=False)
+    updated_at = Column(DateTime, server_default=UTC_NOW, onupdate=UTC_NOW, nullable=False)
     
     # Relationships
     user = relationship("User")
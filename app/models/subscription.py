@@ -1,6 +1,6 @@
-from sqlalchemy import Column, String, DateTime, Enum, ForeignKey
-from sqlalchemy.orm import relationship
-from app.core.database import Base
+from sqlalchemy import Column, String, DateTime, Enum, ForeignKey, Index, text
+from sqlalchemy.orm import deferred, relationship
+from app.core.database import Base, UTC_NOW
 from datetime import datetime
 import enum
 
@@ -24,20 +24,28 @@ class Platform(str, enum.Enum):
 
 class Subscription(Base):
     __tablename__ = "subscriptions"
+    __table_args__ = (
+        # Partial indexes over active rows only (the enum stores member names, hence 'ACTIVE').
+        # Current-subscription lookups: filter by user, newest first
+        Index("ix_sub_user_active", "user_id", "created_at", postgresql_where=text("status = 'ACTIVE'")),
+        # Expiry sweep: active subscriptions past their end date
+        Index("ix_sub_enddate_active", "end_date", postgresql_where=text("status = 'ACTIVE'")),
+    )
     
     id = Column(String, primary_key=True, index=True)
     user_id = Column(String, ForeignKey("users.id"), nullable=False, index=True)
     plan_tier = Column(String, nullable=False, index=True)  # 'free', 'pro'
-    status = Column(Enum(SubscriptionStatus), nullable=False, default=SubscriptionStatus.PENDING, index=True)
+    status = Column(Enum(SubscriptionStatus), nullable=False, default=SubscriptionStatus.PENDING)
     billing_period = Column(Enum(BillingPeriod), nullable=True)  # null for free tier
     platform = Column(Enum(Platform), nullable=True)  # null for free tier
     purchase_token = Column(String, nullable=True)  # Google Play purchase token
-    receipt_data = Column(String, nullable=True)  # Apple receipt data or additional metadata
+    receipt_data = deferred(Column(String, nullable=True))  # Apple receipt data or additional metadata (deferred: write-mostly)
     start_date = Column(DateTime, default=datetime.utcnow)
     end_date = Column(DateTime, nullable=True)  # null for free tier or until cancelled
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=UTC_NOW, nullable=False)
+    updated_at = Column(DateTime, server_default=UTC_NOW, onupdate=UTC_NOW, nullable=False)
     
     # Relationships
-    user = relationship("User", back_populates="subscriptions")
+    # Not loaded implicitly: queries that need the owner opt in with joinedload/selectinload
+    user = relationship("User", back_populates="subscriptions", lazy="raise")
 
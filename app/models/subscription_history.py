@@ -1,20 +1,39 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, String, DateTime, Enum, ForeignKey, Index, desc
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import relationship
-from app.core.database import Base
-from datetime import datetime
+from app.core.database import Base, UTC_NOW
+import enum
+import uuid
+
+
+class HistoryAction(str, enum.Enum):
+    CREATED = "created"
+    UPGRADED = "upgraded"
+    CANCELLED = "cancelled"
+    RENEWED = "renewed"
+    EXPIRED = "expired"
 
 
 class SubscriptionHistory(Base):
     __tablename__ = "subscription_history"
+    __table_args__ = (
+        # User history timeline (newest first) is read straight from the index, no sort step
+        Index("ix_subhist_user_created", "user_id", desc("created_at")),
+    )
     
-    id = Column(String, primary_key=True, index=True)
-    user_id = Column(String, ForeignKey("users.id"), nullable=False, index=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)  # 16-byte native uuid
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
     subscription_id = Column(String, ForeignKey("subscriptions.id"), nullable=False, index=True)
-    action = Column(String, nullable=False, index=True)  # 'created', 'upgraded', 'cancelled', 'renewed', 'expired'
+    # Native Postgres enum labelled with the lowercase values (matches the rows stored as strings before)
+    action = Column(
+        Enum(HistoryAction, name="history_action", values_callable=lambda e: [m.value for m in e]),
+        nullable=False,
+        index=True
+    )
     from_plan = Column(String, nullable=True)
     to_plan = Column(String, nullable=True)
-    details = Column(Text, nullable=True)  # JSON for additional details (renamed from 'metadata' to avoid SQLAlchemy conflict)
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    details = Column(JSONB, nullable=True)  # Additional details (renamed from 'metadata' to avoid SQLAlchemy conflict)
+    created_at = Column(DateTime, server_default=UTC_NOW, nullable=False)
     
     # Relationships
     user = relationship("User")
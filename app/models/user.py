@@ -1,7 +1,6 @@
-from sqlalchemy import Column, String, DateTime, Boolean
+from sqlalchemy import Column, String, DateTime, Boolean, Integer
 from sqlalchemy.orm import relationship
-from app.core.database import Base
-from datetime import datetime
+from app.core.database import Base, UTC_NOW
 
 
 class User(Base):
@@ -11,8 +10,9 @@ class User(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     plan_tier = Column(String, nullable=False, default='free', index=True)  # 'free', 'pro'
     is_tester = Column(Boolean, default=False, nullable=False)  # Testers get pro-level access without subscription
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    instance_count = Column(Integer, default=0, server_default='0', nullable=False)  # Kept in step with n8n_instances by InstanceService
+    created_at = Column(DateTime, server_default=UTC_NOW, nullable=False)
+    updated_at = Column(DateTime, server_default=UTC_NOW, onupdate=UTC_NOW, nullable=False)
     is_active = Column(Boolean, default=True)
     
     # Relationships
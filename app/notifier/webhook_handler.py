@@ -1,10 +1,18 @@
+import base64
 import logging
+import time
+from collections import OrderedDict
 from enum import Enum
+from functools import lru_cache
 from typing import Any, Dict, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from pydantic import BaseModel, Field
+import orjson
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app.core.database import get_db
 from app.core.middleware import get_current_user
@@ -18,6 +26,40 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# n8n retries webhook POSTs it considers failed. Accepted (instance, execution)
+# pairs are remembered in-process so a retry gets the original response
+# without repeating the lookups or the push.
+N8N_ERROR_DEDUP_TTL_SECONDS = 300
+N8N_ERROR_DEDUP_MAX_ENTRIES = 100_000
+
+# (instance_id, execution_id) -> (expires_at, response), oldest first
+_accepted_n8n_errors: "OrderedDict[tuple[str, str], tuple[float, dict]]" = OrderedDict()
+
+# Most rejected webhooks come from Free-plan users; encode that 403 body once.
+# Same shape as an HTTPException response, without the exception handler pass.
+FREE_PLAN_REJECTION_BODY = orjson.dumps({
+    "detail": "Push notifications are not available on the Free plan. "
+    "Upgrade to Pro or higher to receive instant error alerts from your workflows."
+})
+
+
+@lru_cache(maxsize=1)
+def get_instance_service() -> InstanceService:
+    """Dependency to get the shared instance service (built on first use)"""
+    return InstanceService()
+
+
+@lru_cache(maxsize=1)
+def get_fcm_service() -> FCMService:
+    """Dependency to get the shared FCM service (built on first use)"""
+    return FCMService()
+
+
+@lru_cache(maxsize=1)
+def get_analytics_service() -> AnalyticsService:
+    """Dependency to get the shared analytics service (built on first use)"""
+    return AnalyticsService()
+
 
 class Severity(str, Enum):
     """Notification severity levels"""
@@ -42,102 +84,192 @@ class N8NErrorRequest(BaseModel):
         Severity.ERROR, description="Notification severity level"
     )
 
-    class Config:
-        populate_by_name = True  # Allow both camelCase and snake_case
-        use_enum_values = True  # Use enum values in JSON
+    model_config = ConfigDict(
+        populate_by_name=True,  # Allow both camelCase and snake_case
+        use_enum_values=True,  # Use enum values in JSON
+    )
+
 
+async def parse_n8n_error_request(raw_request: Request) -> N8NErrorRequest:
+    """Dependency to parse the n8n error webhook body
 
-@router.post("/n8n-error")
-async def handle_n8n_error(
+    Validates the raw bytes in one pydantic-core pass instead of stdlib
+    json.loads into a dict followed by model validation.
+    """
+    try:
+        return N8NErrorRequest.model_validate_json(await raw_request.body())
+    except ValidationError as e:
+        # Same 422 response FastAPI gives for body validation errors
+        raise RequestValidationError(
+            [{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)]
+        )
+
+
+def _load_webhook_context(db: Session, instance_service: InstanceService, instance_id: str):
+    """Run the n8n error webhook's DB reads, then release the session
+
+    Returns:
+        (instance, owning user, plan config); user and plan are None if the owner is missing
+    """
+    try:
+        instance, user = instance_service.get_webhook_target(db, instance_id)
+        plan_config = PlanConfiguration.get_plan(db, user.plan_tier) if user else None
+        return instance, user, plan_config
+    finally:
+        # Hand the pooled connection back now instead of when the request finishes
+        db.close()
+
+
+def _get_accepted_n8n_error(key: tuple[str, str]) -> Optional[dict]:
+    """Get the response already sent for an (instance, execution) pair, if recent"""
+    entry = _accepted_n8n_errors.get(key)
+    if entry and entry[0] > time.monotonic():
+        return entry[1]
+    return None
+
+
+def _remember_accepted_n8n_error(key: tuple[str, str], response: dict):
+    """Record an accepted (instance, execution) pair, evicting expired or excess entries"""
+    now = time.monotonic()
+    _accepted_n8n_errors[key] = (now + N8N_ERROR_DEDUP_TTL_SECONDS, response)
+    _accepted_n8n_errors.move_to_end(key)
+    # Every entry has the same TTL, so the oldest (first) entries expire first
+    while _accepted_n8n_errors and (
+        len(_accepted_n8n_errors) > N8N_ERROR_DEDUP_MAX_ENTRIES
+        or next(iter(_accepted_n8n_errors.values()))[0] <= now
+    ):
+        _accepted_n8n_errors.popitem(last=False)
+
+
+def _reject_n8n_error(
+    analytics: AnalyticsService,
     request: N8NErrorRequest,
+    status_code: int,
+    detail: str,
+    error: str,
+    user_id: Optional[str] = None,
+    **parameters: Any,
+) -> HTTPException:
+    """Log a failed n8n error webhook and return the HTTPException to raise"""
+    _log_n8n_error_failure(analytics, request, error, user_id, **parameters)
+    return HTTPException(status_code=status_code, detail=detail)
+
+
+def _log_n8n_error_failure(
+    analytics: AnalyticsService,
+    request: N8NErrorRequest,
+    error: str,
+    user_id: Optional[str] = None,
+    **parameters: Any,
+):
+    """Log a failed n8n error webhook with the common request parameters"""
+    analytics.log_failure(
+        action="webhook_n8n_error",
+        error=error,
+        user_id=user_id,
+        parameters={
+            "instance_id": request.instanceId,
+            "execution_id": request.executionId,
+            **parameters,
+        },
+    )
+
+
+@router.post(
+    "/n8n-error",
+    status_code=status.HTTP_202_ACCEPTED,
+    openapi_extra={
+        "requestBody": {
+            "content": {
+                "application/json": {
+                    "schema": {"$ref": "#/components/schemas/N8NErrorRequest"}
+                }
+            },
+            "required": True,
+        }
+    },
+)
+async def handle_n8n_error(
+    background_tasks: BackgroundTasks,
+    request: N8NErrorRequest = Depends(parse_n8n_error_request),
     db: Session = Depends(get_db),
+    instance_service: InstanceService = Depends(get_instance_service),
+    fcm_service: FCMService = Depends(get_fcm_service),
+    analytics: AnalyticsService = Depends(get_analytics_service),
 ):
     """Handle n8n error webhook and send FCM push notification
 
     This endpoint receives error notifications from n8n workflows and sends
-    push notifications to the instance owner's registered devices.
+    push notifications to the instance owner's registered devices. The push is
+    sent after responding (202 Accepted), so n8n doesn't wait on FCM.
 
     Requires:
     - Valid instance ID
     - Instance must be enabled
     - User must have Pro plan (or be a tester) for push notifications
+
+    Retries of an already accepted execution get the original response.
     """
     logger.info(
-        f"handle_n8n_error: Entry - execution: {request.executionId}, instance: {request.instanceId}"
+        "handle_n8n_error: Entry - execution: %s, instance: %s",
+        request.executionId,
+        request.instanceId,
     )
-    analytics = AnalyticsService()
+
+    dedup_key = (request.instanceId, request.executionId)
+    accepted = _get_accepted_n8n_error(dedup_key)
+    if accepted is not None:
+        logger.info(
+            "handle_n8n_error: Duplicate - execution: %s already accepted",
+            request.executionId,
+        )
+        return accepted
 
     try:
-        # Get instance
-        instance_service = InstanceService()
-        instance = instance_service.get_instance_by_id(db, request.instanceId)
+        # Get instance, owner and plan. The sync Session blocks, so run the lookups in
+        # the threadpool to keep the event loop free for other webhooks.
+        instance, user, plan_config = await run_in_threadpool(
+            _load_webhook_context, db, instance_service, request.instanceId
+        )
 
         if not instance:
-            analytics.log_failure(
-                action="webhook_n8n_error",
-                error="Instance not found",
-                parameters={
-                    "instance_id": request.instanceId,
-                    "execution_id": request.executionId,
-                },
-            )
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
+            raise _reject_n8n_error(
+                analytics, request, status.HTTP_404_NOT_FOUND,
                 detail=f"Instance not found: {request.instanceId}",
+                error="Instance not found",
             )
 
-        # Get user
-        user = db.query(User).filter(User.id == instance.user_id).first()
         if not user:
-            analytics.log_failure(
-                action="webhook_n8n_error",
+            raise _reject_n8n_error(
+                analytics, request, status.HTTP_404_NOT_FOUND,
+                detail="User not found",
                 error="User not found",
                 user_id=instance.user_id,
-                parameters={
-                    "instance_id": request.instanceId,
-                    "execution_id": request.executionId,
-                },
-            )
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
             )
 
         # Check if instance is enabled
         if not instance.enabled:
-            analytics.log_failure(
-                action="webhook_n8n_error",
+            raise _reject_n8n_error(
+                analytics, request, status.HTTP_403_FORBIDDEN,
+                detail="Instance is disabled. Please enable the instance in FlowDash to receive error notifications.",
                 error="Instance disabled",
                 user_id=instance.user_id,
-                parameters={
-                    "instance_id": request.instanceId,
-                    "execution_id": request.executionId,
-                },
-            )
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Instance is disabled. Please enable the instance in FlowDash to receive error notifications.",
             )
 
         # Check plan allows push notifications
         # Testers get unlimited access - bypass plan restrictions
-        plan_config = PlanConfiguration.get_plan(db, user.plan_tier)
-
         if not plan_config["push_notifications"] and not user.is_tester:
-            analytics.log_failure(
-                action="webhook_n8n_error",
+            _log_n8n_error_failure(
+                analytics, request,
                 error="Plan does not support push notifications",
                 user_id=instance.user_id,
-                parameters={
-                    "instance_id": request.instanceId,
-                    "execution_id": request.executionId,
-                    "plan_tier": user.plan_tier,
-                    "is_tester": user.is_tester,
-                },
+                plan_tier=user.plan_tier,
+                is_tester=user.is_tester,
             )
-            raise HTTPException(
+            return Response(
+                content=FREE_PLAN_REJECTION_BODY,
                 status_code=status.HTTP_403_FORBIDDEN,
-                detail="Push notifications are not available on the Free plan. "
-                "Upgrade to Pro or higher to receive instant error alerts from your workflows.",
+                media_type="application/json",
             )
 
         # Extract error message
@@ -151,16 +283,16 @@ async def handle_n8n_error(
         effective_plan = user.plan_tier + (" (Tester)" if user.is_tester else "")
 
         logger.info(
-            f"handle_n8n_error: Processing - "
-            f"workflow: {request.workflowId}, "
-            f"instance: {request.instanceId}, "
-            f"severity: {request.severity}, "
-            f"user_plan: {effective_plan}"
+            "handle_n8n_error: Processing - workflow: %s, instance: %s, severity: %s, user_plan: %s",
+            request.workflowId,
+            request.instanceId,
+            request.severity,
+            effective_plan,
         )
 
-        # Send FCM notification to all user devices
-        fcm_service = FCMService()
-        await fcm_service.send_error_notification(
+        # Send FCM notification to all user devices once the response is sent
+        background_tasks.add_task(
+            fcm_service.send_error_notification,
             user_id=instance.user_id,
             workflow_id=request.workflowId,
             execution_id=request.executionId,
@@ -183,152 +315,153 @@ async def handle_n8n_error(
         )
 
         logger.info(
-            f"handle_n8n_error: Success - notification sent to user: {instance.user_id}"
+            "handle_n8n_error: Success - notification queued for user: %s",
+            instance.user_id,
         )
-        return {
+        response = {
             "status": "success",
-            "message": "Notification sent",
+            "message": "Notification queued",
             "user_id": instance.user_id,
             "severity": request.severity,
         }
+        _remember_accepted_n8n_error(dedup_key, response)
+        return response
 
     except HTTPException:
         raise
     except Exception as e:
-        analytics.log_failure(
-            action="webhook_n8n_error",
+        logger.error("handle_n8n_error: Failure - %s", e, exc_info=True)
+        raise _reject_n8n_error(
+            analytics, request, status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e),
             error=str(e),
-            parameters={
-                "instance_id": request.instanceId,
-                "execution_id": request.executionId,
-            },
-        )
-        logger.error(f"handle_n8n_error: Failure - {e}", exc_info=True)
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         )
 
 
-@router.post("/google-play")
-async def handle_google_play_notification(
-    request: Dict[str, Any],
-    db: Session = Depends(get_db),
-):
-    """Handle Google Play Real-time Developer Notifications
+# Store notifications are acknowledged as soon as the body is read; parsing and
+# processing run as background tasks so the stores never wait on our side.
+BILLING_WEBHOOK_ACK = {"status": "acknowledged", "message": "Notification received"}
 
-    Google sends notifications for subscription events like:
-    - Subscription purchased
-    - Subscription renewed
-    - Subscription cancelled
-    - Subscription expired
 
-    See: https://developer.android.com/google/play/billing/rtdn-reference
+def process_google_play_notification(body: bytes):
+    """Parse and process a Google Play Real-time Developer Notification
+
+    Runs after the webhook has been acknowledged. Failures are logged only;
+    Google has already received its 200.
     """
-    logger.info(f"handle_google_play_notification: Entry")
+    logger.info("process_google_play_notification: Entry")
 
     try:
-        # Extract notification data
         # Note: In production, you should verify the notification signature
         # using Google's public key
-
+        request = orjson.loads(body)
         message = request.get("message", {})
         data = message.get("data", {})
 
-        # Decode base64 data if present
-        import base64
-        import json
-
+        # Decode base64 data if present (orjson parses the decoded bytes directly)
         if isinstance(data, str):
-            decoded_data = base64.b64decode(data).decode("utf-8")
-            notification_data = json.loads(decoded_data)
+            notification_data = orjson.loads(base64.b64decode(data))
         else:
             notification_data = data
 
-        logger.info(
-            f"handle_google_play_notification: Processing - {notification_data}"
-        )
+        # The raw payload can be large; only render it when debugging
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "process_google_play_notification: Processing - %s", notification_data
+            )
 
         # Handle different notification types
         notification_type = notification_data.get("notificationType")
-        subscription_notification = notification_data.get(
-            "subscriptionNotification", {}
-        )
-
-        purchase_token = subscription_notification.get("purchaseToken")
+        try:
+            purchase_token = notification_data["subscriptionNotification"]["purchaseToken"]
+        except KeyError:
+            # Test and one-time product notifications carry no subscription token
+            purchase_token = None
 
         # TODO: Implement actual subscription update logic based on notification type
         # For now, just log the notification
 
         logger.info(
-            f"handle_google_play_notification: Success - type: {notification_type}, "
-            f"token: {purchase_token[:20] if purchase_token else 'None'}..."
+            "process_google_play_notification: Success - type: %s, token: %s...",
+            notification_type,
+            purchase_token[:20] if purchase_token else "None",
         )
-
-        return {
-            "status": "success",
-            "message": "Notification processed",
-            "notification_type": notification_type,
-        }
-
     except Exception as e:
-        logger.error(f"handle_google_play_notification: Failure - {e}", exc_info=True)
-        # Don't return error to Google - acknowledge receipt
-        return {
-            "status": "acknowledged",
-            "message": "Notification received but processing failed",
-        }
-
+        logger.error("process_google_play_notification: Failure - %s", e, exc_info=True)
 
-@router.post("/apple-store")
-async def handle_apple_store_notification(
-    request: Dict[str, Any],
-    db: Session = Depends(get_db),
-):
-    """Handle Apple App Store Server Notifications
 
-    Apple sends notifications for subscription events like:
-    - DID_RENEW
-    - CANCEL
-    - DID_CHANGE_RENEWAL_STATUS
-    - EXPIRED
-    - GRACE_PERIOD_EXPIRED
+def process_apple_store_notification(body: bytes):
+    """Parse and process an App Store Server Notification
 
-    See: https://developer.apple.com/documentation/appstoreservernotifications
+    Runs after the webhook has been acknowledged. Failures are logged only;
+    Apple has already received its 200.
     """
-    logger.info(f"handle_apple_store_notification: Entry")
+    logger.info("process_apple_store_notification: Entry")
 
     try:
-        # Extract notification data
         # Note: In production, you should verify the JWT signature
         # using Apple's public key
-
+        request = orjson.loads(body)
         notification_type = request.get("notificationType")
         data = request.get("data", {})
 
         logger.info(
-            f"handle_apple_store_notification: Processing - type: {notification_type}"
+            "process_apple_store_notification: Processing - type: %s", notification_type
         )
 
         # TODO: Implement actual subscription update logic based on notification type
         # For now, just log the notification
 
         logger.info(
-            f"handle_apple_store_notification: Success - type: {notification_type}"
+            "process_apple_store_notification: Success - type: %s", notification_type
         )
+    except Exception as e:
+        logger.error("process_apple_store_notification: Failure - %s", e, exc_info=True)
 
-        return {
-            "status": "success",
-            "message": "Notification processed",
-            "notification_type": notification_type,
-        }
 
-    except Exception as e:
-        logger.error(f"handle_apple_store_notification: Failure - {e}", exc_info=True)
-        # Don't return error to Apple - acknowledge receipt
-        return {
-            "status": "acknowledged",
-            "message": "Notification received but processing failed",
-        }
+@router.post("/google-play")
+async def handle_google_play_notification(
+    raw_request: Request,
+    background_tasks: BackgroundTasks,
+):
+    """Handle Google Play Real-time Developer Notifications
+
+    Google sends notifications for subscription events like:
+    - Subscription purchased
+    - Subscription renewed
+    - Subscription cancelled
+    - Subscription expired
+
+    The notification is acknowledged immediately and processed in the background.
+
+    See: https://developer.android.com/google/play/billing/rtdn-reference
+    """
+    logger.info("handle_google_play_notification: Entry")
+    background_tasks.add_task(process_google_play_notification, await raw_request.body())
+    return BILLING_WEBHOOK_ACK
+
+
+@router.post("/apple-store")
+async def handle_apple_store_notification(
+    raw_request: Request,
+    background_tasks: BackgroundTasks,
+):
+    """Handle Apple App Store Server Notifications
+
+    Apple sends notifications for subscription events like:
+    - DID_RENEW
+    - CANCEL
+    - DID_CHANGE_RENEWAL_STATUS
+    - EXPIRED
+    - GRACE_PERIOD_EXPIRED
+
+    The notification is acknowledged immediately and processed in the background.
+
+    See: https://developer.apple.com/documentation/appstoreservernotifications
+    """
+    logger.info("handle_apple_store_notification: Entry")
+    background_tasks.add_task(process_apple_store_notification, await raw_request.body())
+    return BILLING_WEBHOOK_ACK
 
 
 @router.post("/test-error")
@@ -336,6 +469,9 @@ async def test_error_notification(
     request: N8NErrorRequest,
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user),
+    instance_service: InstanceService = Depends(get_instance_service),
+    fcm_service: FCMService = Depends(get_fcm_service),
+    analytics: AnalyticsService = Depends(get_analytics_service),
 ):
     """Test error notification endpoint for manual testing
 
@@ -355,13 +491,14 @@ async def test_error_notification(
     """
     user_id = current_user["uid"]
     logger.info(
-        f"test_error_notification: Entry - user: {user_id}, instance: {request.instanceId}"
+        "test_error_notification: Entry - user: %s, instance: %s",
+        user_id,
+        request.instanceId,
     )
-    analytics = AnalyticsService()
 
     try:
         # Get user
-        user = db.query(User).filter(User.id == user_id).first()
+        user = db.get(User, user_id)
         if not user:
             analytics.log_failure(
                 action="test_error_notification",
@@ -395,7 +532,6 @@ async def test_error_notification(
             )
 
         # Get instance and verify ownership
-        instance_service = InstanceService()
         instance = instance_service.get_instance_by_id(db, request.instanceId)
 
         if not instance:
@@ -450,15 +586,14 @@ async def test_error_notification(
         effective_plan = user.plan_tier + (" (Tester)" if user.is_tester else "")
 
         logger.info(
-            f"test_error_notification: Sending test notification - "
-            f"user: {user_id}, "
-            f"instance: {request.instanceId}, "
-            f"severity: {request.severity}, "
-            f"plan: {effective_plan}"
+            "test_error_notification: Sending test notification - user: %s, instance: %s, severity: %s, plan: %s",
+            user_id,
+            request.instanceId,
+            request.severity,
+            effective_plan,
         )
 
         # Send test FCM notification
-        fcm_service = FCMService()
         await fcm_service.send_error_notification(
             user_id=user_id,
             workflow_id=request.workflowId,
@@ -481,7 +616,7 @@ async def test_error_notification(
             },
         )
 
-        logger.info(f"test_error_notification: Success - user: {user_id}")
+        logger.info("test_error_notification: Success - user: %s", user_id)
         return {
             "status": "success",
             "message": "Test notification sent successfully",
@@ -499,7 +634,7 @@ async def test_error_notification(
             user_id=user_id,
             parameters={"instance_id": request.instanceId},
         )
-        logger.error(f"test_error_notification: Failure - {e}", exc_info=True)
+        logger.error("test_error_notification: Failure - %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         )
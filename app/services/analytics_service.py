@@ -1,14 +1,144 @@
 import logging
-from datetime import datetime
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional, Tuple
 from app.core.firebase import get_firestore_client
 
 logger = logging.getLogger(__name__)
 
+# Pending analytics writes held in memory; further events are dropped when full
+ANALYTICS_QUEUE_SIZE = 10_000
+# The writer gathers queued documents into one commit, up to this many writes...
+ANALYTICS_BATCH_MAX_WRITES = 100
+# ...or until this long after the first document of the batch arrived
+ANALYTICS_BATCH_WINDOW_SECONDS = 0.5
+# Longest a flush waits for queued documents (shutdown must not outlast the server's grace period)
+ANALYTICS_FLUSH_TIMEOUT_SECONDS = 5.0
+
+
+class AnalyticsWorker:
+    """Writes analytics documents to Firestore from a background thread.
+    
+    Request handlers enqueue (collection, data) pairs and return immediately;
+    a daemon thread drains the queue and performs the Firestore writes. Documents
+    arriving within a short window are committed together in one WriteBatch.
+    """
+    
+    def __init__(self, maxsize: int = ANALYTICS_QUEUE_SIZE):
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # Firestore client and per-collection references, created once by the writer thread
+        self._db = None
+        self._collections: dict = {}
+    
+    def start(self):
+        """Start the writer thread if it isn't running"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._drain, name="analytics-writer", daemon=True)
+                self._thread.start()
+    
+    def enqueue(self, collection: str, data: dict, *more: Tuple[str, dict]) -> bool:
+        """Queue one or more documents for writing
+        
+        Args:
+            collection: Collection of the first document
+            data: First document
+            more: Further (collection, data) pairs written in the same batch
+        
+        Returns:
+            False if the queue is full and the documents were dropped
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+        try:
+            self._queue.put_nowait(((collection, data), *more))
+            return True
+        except queue.Full:
+            logger.warning(f"enqueue: Queue full, dropping event for {collection}")
+            return False
+    
+    def flush(self, timeout: float = ANALYTICS_FLUSH_TIMEOUT_SECONDS) -> bool:
+        """Wait up to timeout seconds for queued documents to be written
+        
+        Returns:
+            False if documents were still queued at the deadline (they are dropped)
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning(
+                        "flush: Timed out after %ss, dropping %s queued events",
+                        timeout, self._queue.unfinished_tasks
+                    )
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+    
+    def _collection(self, name: str):
+        """Get the CollectionReference for a collection, building it on first use"""
+        ref = self._collections.get(name)
+        if ref is None:
+            if self._db is None:
+                self._db = get_firestore_client()
+            ref = self._collections[name] = self._db.collection(name)
+        return ref
+    
+    def _next_batch(self) -> Tuple[int, list]:
+        """Wait for queued documents and gather them into one batch
+        
+        Returns:
+            Number of queue items taken and the (collection, data) pairs to write
+        """
+        writes = list(self._queue.get())
+        taken = 1
+        deadline = time.monotonic() + ANALYTICS_BATCH_WINDOW_SECONDS
+        while len(writes) < ANALYTICS_BATCH_MAX_WRITES:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                writes.extend(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+            taken += 1
+        return taken, writes
+    
+    def _drain(self):
+        while True:
+            taken, writes = self._next_batch()
+            try:
+                if len(writes) == 1:
+                    collection, data = writes[0]
+                    # Client-side auto ID; set() is a single write with no ID round trip
+                    self._collection(collection).document().set(data)
+                else:
+                    # Everything gathered in the window goes out in a single commit RPC
+                    refs = [(self._collection(collection), data) for collection, data in writes]
+                    batch = self._db.batch()
+                    for ref, data in refs:
+                        batch.set(ref.document(), data)
+                    batch.commit()
+            except Exception as e:
+                # Analytics failures should not break main functionality
+                logger.error(f"_drain: Failure - {len(writes)} documents: {e}")
+            finally:
+                for _ in range(taken):
+                    self._queue.task_done()
+
+
+analytics_worker = AnalyticsWorker()
+
 
 class AnalyticsService:
     def __init__(self):
-        # Firebase Admin SDK
-        self.db = get_firestore_client()
         self.analytics_collection = 'analytics_events'  # For Firebase Analytics
         self.crashlytics_collection = 'crashlytics_errors'  # For Crashlytics-style error tracking
         self.logger = logging.getLogger(__name__)
@@ -30,11 +160,11 @@ class AnalyticsService:
                 'event_name': event_name,
                 'user_id': user_id,
                 'parameters': parameters or {},
-                'timestamp': datetime.utcnow()
+                'timestamp': datetime.now(timezone.utc)
             }
             
-            # Store in Firestore for Firebase Analytics integration
-            self.db.collection(self.analytics_collection).add(event_data)
+            # Store in Firestore for Firebase Analytics integration (written in the background)
+            analytics_worker.enqueue(self.analytics_collection, event_data)
             logger.info(f"log_event: Success - {event_name}")
             
         except Exception as e:
@@ -64,11 +194,11 @@ class AnalyticsService:
                 'stack_trace': stack_trace,
                 'parameters': parameters or {},
                 'fatal': fatal,
-                'timestamp': datetime.utcnow()
+                'timestamp': datetime.now(timezone.utc)
             }
             
-            # Store in Firestore for Crashlytics-style error tracking
-            self.db.collection(self.crashlytics_collection).add(error_data)
+            # Store in Firestore for Crashlytics-style error tracking (written in the background)
+            analytics_worker.enqueue(self.crashlytics_collection, error_data)
             logger.info(f"log_crash: Success - {action}")
             
         except Exception as e:
@@ -110,25 +240,35 @@ class AnalyticsService:
         logger.info(f"log_failure: Entry - {action}, error: {error}")
         
         try:
-            # 1. Log to Firebase Analytics (for product metrics)
-            self.log_event(
-                event_name=f'{action}_failure',
-                user_id=user_id,
-                parameters={
+            timestamp = datetime.now(timezone.utc)
+            
+            # 1. Firebase Analytics event (for product metrics)
+            event_data = {
+                'event_name': f'{action}_failure',
+                'user_id': user_id,
+                'parameters': {
                     'status': 'failure',
                     'error': error,
                     **(parameters or {})
-                }
-            )
+                },
+                'timestamp': timestamp
+            }
+            
+            # 2. Crashlytics-style error record (for error monitoring)
+            error_data = {
+                'action': action,
+                'user_id': user_id,
+                'error_message': error,
+                'stack_trace': stack_trace,
+                'parameters': parameters or {},
+                'fatal': False,  # Non-fatal since we're catching and handling it
+                'timestamp': timestamp
+            }
             
-            # 2. Log to Crashlytics-style error tracking (for error monitoring)
-            self.log_crash(
-                error=error,
-                action=action,
-                user_id=user_id,
-                parameters=parameters,
-                stack_trace=stack_trace,
-                fatal=False  # Non-fatal since we're catching and handling it
+            # Both documents are committed together in one batch
+            analytics_worker.enqueue(
+                self.analytics_collection, event_data,
+                (self.crashlytics_collection, error_data)
             )
             
             logger.info(f"log_failure: Success - {action}")
@@ -1,17 +1,33 @@
-from app.core.firebase import get_firestore_client
+from app.core.firebase import get_async_firestore_client, get_firestore_client
 from firebase_admin import firestore
+from google.api_core.exceptions import FailedPrecondition
+from google.cloud.firestore_v1.base_query import FieldFilter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from typing import Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Firestore caps a WriteBatch at 500 operations
+FIRESTORE_BATCH_LIMIT = 500
+
+# Stale devices fetched per query page; each page is deleted in one batch
+CLEANUP_PAGE_SIZE = FIRESTORE_BATCH_LIMIT
+
+# Users scanned concurrently by cleanup_stale_tokens
+CLEANUP_MAX_WORKERS = 40
+
 
 class DeviceService:
     def __init__(self):
+        # Request-path methods use the async client so Firestore calls don't block the
+        # event loop; the scheduled cleanup job keeps the sync client and its thread pool
         self.db = get_firestore_client()
+        self.async_db = get_async_firestore_client()
         self.logger = logging.getLogger(__name__)
     
-    def register_device(
+    async def register_device(
         self,
         user_id: str,
         device_id: str,
@@ -26,99 +42,101 @@ class DeviceService:
             fcm_token: FCM push notification token
             platform: 'ios' or 'android'
         """
-        self.logger.info(f"register_device: Entry - user: {user_id}, device: {device_id}, platform: {platform}")
+        self.logger.info("register_device: Entry - user: %s, device: %s, platform: %s", user_id, device_id, platform)
         
         try:
-            # Ensure parent user document exists (makes it visible in Firestore console)
-            user_ref = self.db.collection('users').document(user_id)
-            user_doc = user_ref.get()
-            if not user_doc.exists:
-                # Create user document with metadata
-                user_ref.set({
-                    'created_at': firestore.SERVER_TIMESTAMP,
-                    'last_device_registered_at': firestore.SERVER_TIMESTAMP,
-                }, merge=False)
-            
-            # Reference to device document
+            # Merge sets create the user and device documents when missing and update
+            # them otherwise, so neither document is read in full first.
+            # Creation time comes from Firestore's document create_time instead of a
+            # created_at field, which a merge would overwrite on every registration.
+            user_ref = self.async_db.collection('users').document(user_id)
             device_ref = user_ref.collection('devices').document(device_id)
             
             # Get current timestamp
             now = firestore.SERVER_TIMESTAMP
             
-            # Check if device exists
-            device_doc = device_ref.get()
+            # Notifications only trust the user's token map once it is marked complete.
+            # The first registration after the map was introduced copies in the tokens
+            # of devices registered before it, then marks it complete.
+            device_tokens = {device_id: fcm_token}
+            user_doc = await user_ref.get(field_paths=['device_tokens_complete'])
+            if not (user_doc.exists and user_doc.to_dict().get('device_tokens_complete')):
+                async for doc in user_ref.collection('devices').select(['fcm_token']).stream():
+                    existing_token = (doc.to_dict() or {}).get('fcm_token')
+                    if existing_token and doc.id != device_id:
+                        device_tokens[doc.id] = existing_token
             
-            if device_doc.exists:
-                # Update existing device - only update fcm_token and last_used_at
-                device_ref.update({
-                    'fcm_token': fcm_token,
-                    'last_used_at': now,
-                })
-                # Update user document timestamp
-                user_ref.update({
-                    'last_device_registered_at': now,
-                })
-                self.logger.info(f"register_device: Success (updated) - user: {user_id}, device: {device_id}")
-            else:
-                # Create new device document
-                device_ref.set({
-                    'fcm_token': fcm_token,
-                    'platform': platform,
-                    'created_at': now,
-                    'last_used_at': now,
-                })
-                # Update user document timestamp
-                user_ref.update({
-                    'last_device_registered_at': now,
-                })
-                self.logger.info(f"register_device: Success (created) - user: {user_id}, device: {device_id}")
+            batch = self.async_db.batch()
+            # Parent user document keeps devices visible in the Firestore console, and
+            # mirrors every device's token in one map so notifications read a single doc
+            batch.set(user_ref, {
+                'last_device_registered_at': now,
+                'device_tokens': device_tokens,
+                'device_tokens_complete': True,
+            }, merge=True)
+            batch.set(device_ref, {
+                'fcm_token': fcm_token,
+                'platform': platform,
+                'last_used_at': now,
+            }, merge=True)
+            await batch.commit()
+            
+            self.logger.info("register_device: Success - user: %s, device: %s", user_id, device_id)
             
         except Exception as e:
-            self.logger.error(f"register_device: Failure - {e}")
+            self.logger.error("register_device: Failure - %s", e)
             raise
     
-    def delete_device(self, user_id: str, device_id: str):
+    async def delete_device(self, user_id: str, device_id: str):
         """Delete device token for user (on logout)
         
         Args:
             user_id: Firebase UID
             device_id: Unique device identifier
         """
-        self.logger.info(f"delete_device: Entry - user: {user_id}, device: {device_id}")
+        self.logger.info("delete_device: Entry - user: %s, device: %s", user_id, device_id)
         
         try:
-            device_ref = self.db.collection('users').document(user_id).collection('devices').document(device_id)
-            device_ref.delete()
-            self.logger.info(f"delete_device: Success - user: {user_id}, device: {device_id}")
+            user_ref = self.async_db.collection('users').document(user_id)
+            batch = self.async_db.batch()
+            batch.delete(user_ref.collection('devices').document(device_id))
+            # Drop the device's entry from the user's token map too
+            batch.set(user_ref, {'device_tokens': {device_id: firestore.DELETE_FIELD}}, merge=True)
+            await batch.commit()
+            self.logger.info("delete_device: Success - user: %s, device: %s", user_id, device_id)
         except Exception as e:
-            self.logger.error(f"delete_device: Failure - {e}")
+            self.logger.error("delete_device: Failure - %s", e)
             raise
     
-    def get_user_devices(self, user_id: str) -> list:
+    async def get_user_devices(self, user_id: str, fields: Optional[list] = None) -> list:
         """Get all devices for a user
         
         Args:
             user_id: Firebase UID
+            fields: Only fetch these device fields (default: all)
             
         Returns:
             List of device dictionaries with id, fcm_token, platform, created_at, last_used_at
+            (or id plus the requested fields)
         """
-        self.logger.info(f"get_user_devices: Entry - user: {user_id}")
+        self.logger.info("get_user_devices: Entry - user: %s", user_id)
         
         try:
-            devices_ref = self.db.collection('users').document(user_id).collection('devices')
-            devices_docs = devices_ref.stream()
-            
-            devices = []
-            for doc in devices_docs:
-                device_data = doc.to_dict()
-                device_data['id'] = doc.id
-                devices.append(device_data)
+            devices_ref = self.async_db.collection('users').document(user_id).collection('devices')
+            if fields:
+                # Projection: Firestore only sends back the requested fields
+                devices = [{**doc.to_dict(), 'id': doc.id} async for doc in devices_ref.select(fields).stream()]
+            else:
+                # Devices registered without a created_at field report their document creation time
+                devices = [
+                    {'created_at': doc.create_time, **doc.to_dict(), 'id': doc.id}
+                    async for doc in devices_ref.stream()
+                ]
             
-            self.logger.info(f"get_user_devices: Success - user: {user_id}, count: {len(devices)}")
+            self.logger.info("get_user_devices: Success - user: %s, count: %s", user_id, len(devices))
             return devices
         except Exception as e:
-            self.logger.error(f"get_user_devices: Failure - {e}")
+            self.logger.error("get_user_devices: Failure - %s", e)
             raise
     
     def cleanup_stale_tokens(self, days: int = 30):
@@ -127,52 +145,126 @@ class DeviceService:
         NOTE: This should be called by a scheduled job (cron/Cloud Scheduler)
         to run daily and clean up inactive device tokens.
         
+        Stale devices are found with a collection-group query on last_used_at, which
+        needs a collection-group index on devices.last_used_at. Without it, every
+        user's devices are scanned instead.
+        
         Args:
             days: Number of days of inactivity before cleanup (default: 30)
         """
-        self.logger.info(f"cleanup_stale_tokens: Entry - days: {days}")
+        self.logger.info("cleanup_stale_tokens: Entry - days: %s", days)
         
         try:
             # Calculate cutoff timestamp
             cutoff = datetime.utcnow() - timedelta(days=days)
             
-            # Query all users
-            users_ref = self.db.collection('users')
-            users_docs = users_ref.stream()
-            
-            deleted_count = 0
-            
-            for user_doc in users_docs:
-                user_id = user_doc.id
-                devices_ref = user_doc.reference.collection('devices')
-                devices_docs = devices_ref.stream()
+            try:
+                # Firestore filters on its index and returns references only (no bodies),
+                # oldest first, one page at a time
+                stale_query = self.db.collection_group('devices').where(
+                    filter=FieldFilter('last_used_at', '<', cutoff)
+                ).order_by('last_used_at').select([]).limit(CLEANUP_PAGE_SIZE)
                 
-                for device_doc in devices_docs:
-                    device_data = device_doc.to_dict()
-                    last_used_at = device_data.get('last_used_at')
-                    
-                    # Convert Firestore timestamp to datetime if needed
-                    if last_used_at and hasattr(last_used_at, 'timestamp'):
-                        last_used_dt = datetime.fromtimestamp(last_used_at.timestamp())
-                    elif isinstance(last_used_at, datetime):
-                        last_used_dt = last_used_at
-                    else:
-                        # Skip if no valid timestamp
-                        continue
-                    
-                    # Delete if older than cutoff
-                    if last_used_dt < cutoff:
-                        device_doc.reference.delete()
-                        deleted_count += 1
-                        self.logger.info(
-                            f"cleanup_stale_tokens: Deleted stale token - "
-                            f"user: {user_id}, device: {device_doc.id}, "
-                            f"last_used: {last_used_dt}"
-                        )
+                # Deleted devices drop out of the query, so re-running it yields the next
+                # page; a short page means nothing stale is left
+                deleted_count = 0
+                while True:
+                    page = [doc.reference for doc in stale_query.stream()]
+                    deleted_count += self._delete_in_batches(page)
+                    if len(page) < CLEANUP_PAGE_SIZE:
+                        break
+            except FailedPrecondition as e:
+                self.logger.warning("cleanup_stale_tokens: Index unavailable, scanning all users - %s", e)
+                deleted_count = self._cleanup_all_users(cutoff)
             
-            self.logger.info(f"cleanup_stale_tokens: Success - deleted {deleted_count} stale tokens")
+            self.logger.info("cleanup_stale_tokens: Success - deleted %s stale tokens", deleted_count)
             return deleted_count
         except Exception as e:
-            self.logger.error(f"cleanup_stale_tokens: Failure - {e}")
+            self.logger.error("cleanup_stale_tokens: Failure - %s", e)
             raise
-
+    
+    def _cleanup_all_users(self, cutoff: datetime) -> int:
+        """Scan every user's devices and delete those last used before cutoff
+        
+        Returns:
+            Number of devices deleted
+        """
+        users_docs = self.db.collection('users').stream()
+        
+        # Users are independent, so scan and delete for several at once;
+        # the work is almost all waiting on Firestore round trips
+        with ThreadPoolExecutor(max_workers=CLEANUP_MAX_WORKERS) as executor:
+            return sum(
+                executor.map(
+                    lambda user_doc: self._delete_in_batches(self._stale_device_refs(user_doc, cutoff)),
+                    users_docs
+                )
+            )
+    
+    def _stale_device_refs(self, user_doc, cutoff: datetime):
+        """Yield references to one user's devices last used before cutoff"""
+        user_id = user_doc.id
+        # Only last_used_at is needed to decide, so don't fetch the rest of each device
+        devices_docs = user_doc.reference.collection('devices').select(['last_used_at']).stream()
+        
+        for device_doc in devices_docs:
+            try:
+                last_used_at = device_doc.get('last_used_at')
+            except KeyError:
+                last_used_at = None
+            
+            # Convert Firestore timestamp to datetime if needed
+            if last_used_at and hasattr(last_used_at, 'timestamp'):
+                last_used_dt = datetime.fromtimestamp(last_used_at.timestamp())
+            elif isinstance(last_used_at, datetime):
+                last_used_dt = last_used_at
+            else:
+                # Skip if no valid timestamp
+                continue
+            
+            # Delete if older than cutoff
+            if last_used_dt < cutoff:
+                if self.logger.isEnabledFor(logging.DEBUG):
+                    self.logger.debug(
+                        "cleanup_stale_tokens: Deleting stale token - user: %s, device: %s, last_used: %s",
+                        user_id, device_doc.id, last_used_dt
+                    )
+                yield device_doc.reference
+    
+    def _delete_in_batches(self, refs) -> int:
+        """Delete device documents, and their entries in the owners' token maps, with
+        one WriteBatch commit per FIRESTORE_BATCH_LIMIT writes
+        
+        Returns:
+            Number of documents deleted
+        """
+        deleted_count = 0
+        batch = self.db.batch()
+        # user document path -> (user ref, device ids to drop from its token map)
+        token_removals = {}
+        
+        def commit():
+            for user_ref, device_ids in token_removals.values():
+                batch.set(user_ref, {
+                    'device_tokens': {device_id: firestore.DELETE_FIELD for device_id in device_ids}
+                }, merge=True)
+            batch.commit()
+            token_removals.clear()
+        
+        pending = 0
+        for ref in refs:
+            batch.delete(ref)
+            user_ref = ref.parent.parent
+            token_removals.setdefault(user_ref.path, (user_ref, []))[1].append(ref.id)
+            pending += 1
+            deleted_count += 1
+            # One write per device plus one map update per user in the batch
+            if pending + len(token_removals) >= FIRESTORE_BATCH_LIMIT:
+                commit()
+                batch = self.db.batch()
+                pending = 0
+        
+        if pending:
+            commit()
+        
+        return deleted_count
@@ -1,4 +1,4 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, load_only
 from app.models.n8n_instance import N8NInstance
 from app.models.user import User
 from app.services.analytics_service import AnalyticsService
@@ -6,11 +6,169 @@ from app.services.subscription_service import PlanConfiguration
 from app.core.config import settings
 from app.core.security import decrypt_api_key
 from fastapi import HTTPException, status
+from functools import lru_cache
+from typing import Optional
+import asyncio
 import logging
+import random
+import re
+import time
 import httpx
+import orjson
 
 logger = logging.getLogger(__name__)
 
+# n8n calls for a workflow sync go to the same host; share pooled connections across requests
+N8N_CLIENT_LIMITS = httpx.Limits(max_keepalive_connections=100, max_connections=200)
+_n8n_client: Optional[httpx.AsyncClient] = None
+
+# Idempotent n8n calls are retried on transport errors and these gateway statuses,
+# with jittered exponential backoff (~0.1s, then ~0.4s) inside an overall time budget
+N8N_RETRY_ATTEMPTS = 3
+N8N_RETRY_BASE_DELAY_SECONDS = 0.1
+N8N_RETRY_BUDGET_SECONDS = 30.0
+N8N_RETRY_STATUS_CODES = frozenset({502, 503, 504})
+
+# Matches the instanceId key of the error workflow's JSON body
+INSTANCE_ID_FIELD = re.compile(r'"instanceId"\s*:')
+
+
+def get_n8n_client() -> httpx.AsyncClient:
+    """Process-wide HTTP client for n8n API calls, created on first use"""
+    global _n8n_client
+    if _n8n_client is None or _n8n_client.is_closed:
+        _n8n_client = httpx.AsyncClient(http2=True, limits=N8N_CLIENT_LIMITS, timeout=httpx.Timeout(30.0))
+    return _n8n_client
+
+
+async def _with_retry(send, *args, **kwargs) -> httpx.Response:
+    """Call an idempotent n8n request method, retrying transient failures
+    
+    Client errors (4xx) and other statuses are returned to the caller as-is.
+    All attempts and backoff delays together stay within N8N_RETRY_BUDGET_SECONDS.
+    """
+    deadline = time.monotonic() + N8N_RETRY_BUDGET_SECONDS
+    for attempt in range(N8N_RETRY_ATTEMPTS):
+        # Each attempt only gets the time left in the overall budget
+        kwargs['timeout'] = max(deadline - time.monotonic(), 0)
+        try:
+            response = await send(*args, **kwargs)
+        except httpx.TransportError as e:
+            delay = _retry_delay(attempt, deadline)
+            if delay is None:
+                raise
+            logger.warning("_with_retry: Transport error, retrying - attempt: %s, error: %s", attempt + 1, e)
+        else:
+            if response.status_code not in N8N_RETRY_STATUS_CODES:
+                return response
+            delay = _retry_delay(attempt, deadline)
+            if delay is None:
+                return response
+            logger.warning("_with_retry: n8n returned %s, retrying - attempt: %s", response.status_code, attempt + 1)
+        await asyncio.sleep(delay)
+
+
+def _retry_delay(attempt: int, deadline: float) -> Optional[float]:
+    """Backoff before the next attempt, or None if no attempt is left within the budget
+    
+    Checked after the failed attempt, so time spent waiting on it counts against the budget.
+    """
+    if attempt >= N8N_RETRY_ATTEMPTS - 1:
+        return None
+    delay = N8N_RETRY_BASE_DELAY_SECONDS * 4 ** attempt * random.uniform(0.5, 1.5)
+    if time.monotonic() + delay >= deadline:
+        return None
+    return delay
+
+
+async def close_n8n_client():
+    """Close the shared n8n HTTP client"""
+    global _n8n_client
+    if _n8n_client is not None:
+        await _n8n_client.aclose()
+        _n8n_client = None
+
+
+# Settings don't change at runtime, so the webhook URL n8n reports errors to is fixed
+WEBHOOK_URL = f"{settings.api_base_url or 'https://api.flow-dash.com'}{settings.api_v1_str}/webhooks/n8n-error"
+# The error workflow is named after the instance it reports for
+WORKFLOW_NAME_PREFIX = "FlowDash Error Notifications - "
+
+# Error workflow as serialized JSON; only the instance fields vary, so they are
+# substituted into the string with format_map (literal braces are doubled)
+_WORKFLOW_TEMPLATE_JSON = r'''{{
+  "name": "{workflow_name_prefix}{instance_name}",
+  "nodes": [
+    {{
+      "parameters": {{}},
+      "name": "Error Trigger",
+      "type": "n8n-nodes-base.errorTrigger",
+      "typeVersion": 1,
+      "position": [250, 300]
+    }},
+    {{
+      "parameters": {{
+        "url": "{webhook_url}",
+        "method": "POST",
+        "sendBody": true,
+        "specifyBody": "json",
+        "jsonBody": "={{\n  \"executionId\": \"{{{{ $execution.id }}}}\",\n  \"workflowId\": \"{{{{ $workflow.id }}}}\",\n  \"workflowName\": \"{{{{ $workflow.name }}}}\",\n  \"instanceId\": \"{instance_id}\",\n  \"severity\": \"error\",\n  \"error\": {{\n    \"message\": \"{{{{ $json.error.message }}}}\"\n  }}\n}}",
+        "options": {{}}
+      }},
+      "name": "Send to FlowDash",
+      "type": "n8n-nodes-base.httpRequest",
+      "typeVersion": 4.2,
+      "position": [450, 300]
+    }}
+  ],
+  "connections": {{
+    "Error Trigger": {{
+      "main": [
+        [
+          {{
+            "node": "Send to FlowDash",
+            "type": "main",
+            "index": 0
+          }}
+        ]
+      ]
+    }}
+  }},
+  "settings": {{
+    "executionOrder": "v1"
+  }},
+  "staticData": null,
+  "tags": [
+    {{
+      "name": "FlowDash",
+      "id": "flowdash"
+    }}
+  ],
+  "meta": {{
+    "instanceId": "{instance_id}"
+  }}
+}}'''
+
+
+def _json_escape(value: str) -> str:
+    """Escape a value for embedding inside a JSON string literal"""
+    return orjson.dumps(value).decode()[1:-1]
+
+
+@lru_cache(maxsize=1024)
+def _build_workflow_template(instance_id: str, instance_name: str, webhook_url: str) -> bytes:
+    """Serialized (UTF-8 JSON) error workflow for an instance
+    
+    The workflow depends only on these arguments, so the JSON is built once per
+    instance and reused by template requests and n8n syncs.
+    """
+    return _WORKFLOW_TEMPLATE_JSON.format_map({
+        'workflow_name_prefix': WORKFLOW_NAME_PREFIX,
+        'instance_id': _json_escape(instance_id),
+        'instance_name': _json_escape(instance_name),
+        'webhook_url': _json_escape(webhook_url),
+    }).encode('utf-8')
+
 
 class ErrorWorkflowService:
     def __init__(self):
@@ -19,14 +177,14 @@ class ErrorWorkflowService:
     
     def get_base_webhook_url(self) -> str:
         """Get base webhook URL for error notifications"""
-        base_url = settings.api_base_url or "https://api.flow-dash.com"
-        return f"{base_url}{settings.api_v1_str}/webhooks/n8n-error"
+        return WEBHOOK_URL
     
     def create_error_workflow_template(
         self,
         db: Session,
         instance_id: str,
-        user_id: str
+        user_id: str,
+        instance: Optional[N8NInstance] = None
     ) -> dict:
         """
         Generate personalized n8n workflow template with instance_id embedded.
@@ -39,18 +197,21 @@ class ErrorWorkflowService:
             db: Database session
             instance_id: FlowDash instance ID (UUID)
             user_id: User ID for ownership verification
+            instance: Instance already loaded (and ownership-checked) by the caller;
+                skips the lookup
             
         Returns:
             Complete n8n workflow JSON with instance_id embedded
         """
-        self.logger.info(f"create_error_workflow_template: Entry - instance: {instance_id}, user: {user_id}")
+        self.logger.info("create_error_workflow_template: Entry - instance: %s, user: %s", instance_id, user_id)
         
         try:
             # Verify instance ownership
-            instance = db.query(N8NInstance).filter(
-                N8NInstance.id == instance_id,
-                N8NInstance.user_id == user_id
-            ).first()
+            if instance is None:
+                instance = db.query(N8NInstance).filter(
+                    N8NInstance.id == instance_id,
+                    N8NInstance.user_id == user_id
+                ).first()
             
             if not instance:
                 raise HTTPException(
@@ -59,70 +220,10 @@ class ErrorWorkflowService:
                 )
             
             # Get webhook URL
-            webhook_url = self.get_base_webhook_url()
-            
-            # Create personalized workflow template
-            workflow = {
-                "name": f"FlowDash Error Notifications - {instance.name}",
-                "nodes": [
-                    {
-                        "parameters": {},
-                        "name": "Error Trigger",
-                        "type": "n8n-nodes-base.errorTrigger",
-                        "typeVersion": 1,
-                        "position": [250, 300]
-                    },
-                    {
-                        "parameters": {
-                            "url": webhook_url,
-                            "method": "POST",
-                            "sendBody": True,
-                            "specifyBody": "json",
-                            "jsonBody": f"""={{
-  "executionId": "{{{{ $execution.id }}}}",
-  "workflowId": "{{{{ $workflow.id }}}}",
-  "workflowName": "{{{{ $workflow.name }}}}",
-  "instanceId": "{instance_id}",
-  "severity": "error",
-  "error": {{
-    "message": "{{{{ $json.error.message }}}}"
-  }}
-}}""",
-                            "options": {}
-                        },
-                        "name": "Send to FlowDash",
-                        "type": "n8n-nodes-base.httpRequest",
-                        "typeVersion": 4.2,
-                        "position": [450, 300]
-                    }
-                ],
-                "connections": {
-                    "Error Trigger": {
-                        "main": [
-                            [
-                                {
-                                    "node": "Send to FlowDash",
-                                    "type": "main",
-                                    "index": 0
-                                }
-                            ]
-                        ]
-                    }
-                },
-                "settings": {
-                    "executionOrder": "v1"
-                },
-                "staticData": None,
-                "tags": [
-                    {
-                        "name": "FlowDash",
-                        "id": "flowdash"
-                    }
-                ],
-                "meta": {
-                    "instanceId": instance_id
-                }
-            }
+            webhook_url = WEBHOOK_URL
+            
+            # Personalized workflow template (cached JSON); a fresh dict per caller
+            workflow = orjson.loads(_build_workflow_template(instance_id, instance.name, webhook_url))
             
             self.analytics.log_success(
                 action='create_error_workflow_template',
@@ -132,7 +233,7 @@ class ErrorWorkflowService:
                     'instance_name': instance.name
                 }
             )
-            self.logger.info(f"create_error_workflow_template: Success - instance: {instance_id}")
+            self.logger.info("create_error_workflow_template: Success - instance: %s", instance_id)
             
             return workflow
             
@@ -145,7 +246,7 @@ class ErrorWorkflowService:
                 user_id=user_id,
                 parameters={'instance_id': instance_id}
             )
-            self.logger.error(f"create_error_workflow_template: Failure - {e}")
+            self.logger.error("create_error_workflow_template: Failure - %s", e)
             raise
     
     def validate_workflow_config(self, workflow_json: dict) -> bool:
@@ -167,35 +268,32 @@ class ErrorWorkflowService:
         self.logger.info("validate_workflow_config: Entry")
         
         try:
-            nodes = workflow_json.get('nodes', [])
-            
-            # Check for Error Trigger
-            has_error_trigger = any(
-                node.get('type') == 'n8n-nodes-base.errorTrigger'
-                for node in nodes
-            )
-            
-            if not has_error_trigger:
-                self.logger.warning("validate_workflow_config: Missing Error Trigger node")
-                return False
-            
-            # Check for HTTP Request node with FlowDash URL
-            webhook_url_base = self.get_base_webhook_url()
+            # Single pass over the nodes, stopping once every requirement is met
+            has_error_trigger = False
             has_flowdash_webhook = False
             has_instance_id = False
             
-            for node in nodes:
-                if node.get('type') == 'n8n-nodes-base.httpRequest':
+            for node in workflow_json.get('nodes', []):
+                node_type = node.get('type')
+                if node_type == 'n8n-nodes-base.errorTrigger':
+                    has_error_trigger = True
+                elif node_type == 'n8n-nodes-base.httpRequest':
                     params = node.get('parameters', {})
-                    url = params.get('url', '')
                     
-                    if webhook_url_base in url:
+                    # HTTP Request node with FlowDash URL
+                    if WEBHOOK_URL in params.get('url', ''):
                         has_flowdash_webhook = True
                         
-                        # Check for instanceId in body
-                        json_body = params.get('jsonBody', '')
-                        if 'instanceId' in json_body:
+                        # Check for an instanceId field in body, not just the word
+                        if INSTANCE_ID_FIELD.search(params.get('jsonBody', '')):
                             has_instance_id = True
+                
+                if has_error_trigger and has_instance_id:
+                    break
+            
+            if not has_error_trigger:
+                self.logger.warning("validate_workflow_config: Missing Error Trigger node")
+                return False
             
             if not has_flowdash_webhook:
                 self.logger.warning("validate_workflow_config: Missing FlowDash webhook URL")
@@ -209,9 +307,67 @@ class ErrorWorkflowService:
             return True
             
         except Exception as e:
-            self.logger.error(f"validate_workflow_config: Failure - {e}")
+            self.logger.error("validate_workflow_config: Failure - %s", e)
             return False
     
+    async def _find_workflow_id(self, client: httpx.AsyncClient, instance_url: str, api_key: str, workflow_name: str) -> Optional[str]:
+        """Find a workflow in n8n by name
+        
+        Returns:
+            The workflow id, or None if none was found or n8n could not be asked
+        """
+        try:
+            # Ask n8n for the FlowDash error workflow by name rather than listing everything
+            list_response = await _with_retry(
+                client.get,
+                f"{instance_url}/api/v1/workflows",
+                headers={"X-N8N-API-KEY": api_key},
+                params={"name": workflow_name}
+            )
+            
+            if list_response.status_code == 200:
+                workflows = orjson.loads(list_response.content).get('data', [])
+                for wf in workflows:
+                    if wf.get('name') == workflow_name:
+                        self.logger.info("create_workflow_in_n8n: Found existing workflow - id: %s", wf.get('id'))
+                        return wf.get('id')
+        except Exception as e:
+            self.logger.warning("create_workflow_in_n8n: Could not check for existing workflow - %s", e)
+            # Continue anyway, will try to create
+        return None
+    
+    async def _update_workflow(
+        self,
+        client: httpx.AsyncClient,
+        instance_url: str,
+        headers: dict,
+        workflow_id: str,
+        workflow_body: bytes
+    ) -> Optional[str]:
+        """Replace an existing n8n workflow
+        
+        Returns:
+            The workflow id, or None if the workflow no longer exists in n8n
+            
+        Raises:
+            Exception: If n8n rejects the update for any other reason
+        """
+        update_response = await _with_retry(
+            client.put,
+            f"{instance_url}/api/v1/workflows/{workflow_id}",
+            headers=headers,
+            content=workflow_body
+        )
+        
+        if update_response.status_code == 200:
+            self.logger.info("create_workflow_in_n8n: Updated workflow - id: %s", workflow_id)
+            return workflow_id
+        if update_response.status_code == 404:
+            # Workflow was deleted in n8n; the caller creates it again
+            self.logger.info("create_workflow_in_n8n: Workflow gone, recreating - id: %s", workflow_id)
+            return None
+        raise Exception(f"Failed to update workflow: {update_response.status_code} - {update_response.text}")
+    
     async def create_workflow_in_n8n(
         self,
         db: Session,
@@ -222,12 +378,12 @@ class ErrorWorkflowService:
         Automatically create and activate error workflow in user's n8n instance.
         
         This method:
-        1. Verifies instance ownership and user plan (Pro+ required)
+        1. Verifies instance ownership and user plan (Pro+ required) in one query
         2. Retrieves and decrypts the n8n API key
         3. Generates the personalized workflow template
-        4. Checks if a FlowDash error workflow already exists
+        4. Updates the workflow saved on the instance, or finds one by name
         5. Creates or updates the workflow in n8n
-        6. Activates the workflow
+        6. Activates the workflow and saves its id on the instance
         7. Returns workflow details
         
         Args:
@@ -246,20 +402,39 @@ class ErrorWorkflowService:
         Raises:
             HTTPException: If user doesn't have permission, plan doesn't allow, or n8n API fails
         """
-        self.logger.info(f"create_workflow_in_n8n: Entry - instance: {instance_id}, user: {user_id}")
+        self.logger.info("create_workflow_in_n8n: Entry - instance: %s, user: %s", instance_id, user_id)
         
         try:
-            # Get user and check plan
-            user = db.query(User).filter(User.id == user_id).first()
-            if not user:
+            # Get instance (with its deferred API key) and its owner's plan in one query;
+            # filtering on user_id verifies ownership
+            row = db.query(N8NInstance, User.plan_tier, User.is_tester).join(
+                User, User.id == N8NInstance.user_id
+            ).options(
+                load_only(
+                    N8NInstance.id, N8NInstance.name, N8NInstance.url,
+                    N8NInstance.api_key_encrypted, N8NInstance.n8n_error_workflow_id
+                )
+            ).filter(
+                N8NInstance.id == instance_id,
+                N8NInstance.user_id == user_id
+            ).first()
+            
+            if not row:
+                self.analytics.log_failure(
+                    action='create_workflow_in_n8n',
+                    error='Instance not found',
+                    user_id=user_id,
+                    parameters={'instance_id': instance_id}
+                )
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
-                    detail="User not found"
+                    detail="Instance not found or you don't have permission to access it"
                 )
+            instance, plan_tier, is_tester = row
             
             # Check plan allows push notifications (and thus error workflows)
-            # PlanConfiguration.get_plan handles tester bypass internally
-            plan_config = PlanConfiguration.get_plan(db, user.plan_tier, user=user)
+            # Testers get pro-level access
+            plan_config = PlanConfiguration.get_plan(db, 'pro' if is_tester else plan_tier)
             
             if not plan_config['push_notifications']:
                 self.analytics.log_failure(
@@ -268,8 +443,8 @@ class ErrorWorkflowService:
                     user_id=user_id,
                     parameters={
                         'instance_id': instance_id,
-                        'plan_tier': user.plan_tier,
-                        'is_tester': user.is_tester
+                        'plan_tier': plan_tier,
+                        'is_tester': is_tester
                     }
                 )
                 raise HTTPException(
@@ -277,24 +452,6 @@ class ErrorWorkflowService:
                     detail="Push notifications require Pro plan or higher. Upgrade to automatically create error workflows."
                 )
             
-            # Get instance and verify ownership
-            instance = db.query(N8NInstance).filter(
-                N8NInstance.id == instance_id,
-                N8NInstance.user_id == user_id
-            ).first()
-            
-            if not instance:
-                self.analytics.log_failure(
-                    action='create_workflow_in_n8n',
-                    error='Instance not found',
-                    user_id=user_id,
-                    parameters={'instance_id': instance_id}
-                )
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Instance not found or you don't have permission to access it"
-                )
-            
             # Decrypt API key
             try:
                 api_key = decrypt_api_key(instance.api_key_encrypted)
@@ -310,72 +467,48 @@ class ErrorWorkflowService:
                     detail="Failed to decrypt n8n API key"
                 )
             
-            # Generate workflow template
-            workflow_template = self.create_error_workflow_template(db, instance_id, user_id)
+            # Generate workflow template; the request body is the cached serialized bytes
+            workflow_body = _build_workflow_template(instance_id, instance.name, WEBHOOK_URL)
             
-            # Check if FlowDash error workflow already exists
-            workflow_name = workflow_template['name']
-            existing_workflow_id = None
-            
-            try:
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    # List all workflows to find existing FlowDash error workflow
-                    list_response = await client.get(
-                        f"{instance.url}/api/v1/workflows",
-                        headers={"X-N8N-API-KEY": api_key}
-                    )
-                    
-                    if list_response.status_code == 200:
-                        workflows = list_response.json().get('data', [])
-                        for wf in workflows:
-                            if wf.get('name') == workflow_name:
-                                existing_workflow_id = wf.get('id')
-                                self.logger.info(f"create_workflow_in_n8n: Found existing workflow - id: {existing_workflow_id}")
-                                break
-            except Exception as e:
-                self.logger.warning(f"create_workflow_in_n8n: Could not check for existing workflow - {e}")
-                # Continue anyway, will try to create
+            # All n8n calls below reuse the shared pooled client
+            client = get_n8n_client()
             
+            workflow_name = WORKFLOW_NAME_PREFIX + instance.name
             # Create or update workflow
             workflow_id = None
-            is_update = False
+            headers = {
+                "X-N8N-API-KEY": api_key,
+                "Content-Type": "application/json"
+            }
             
             try:
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    if existing_workflow_id:
-                        # Update existing workflow
-                        update_response = await client.put(
-                            f"{instance.url}/api/v1/workflows/{existing_workflow_id}",
-                            headers={
-                                "X-N8N-API-KEY": api_key,
-                                "Content-Type": "application/json"
-                            },
-                            json=workflow_template
-                        )
-                        
-                        if update_response.status_code == 200:
-                            workflow_id = existing_workflow_id
-                            is_update = True
-                            self.logger.info(f"create_workflow_in_n8n: Updated workflow - id: {workflow_id}")
-                        else:
-                            raise Exception(f"Failed to update workflow: {update_response.status_code} - {update_response.text}")
+                # Update the workflow saved by an earlier sync directly, without searching for it
+                stored_workflow_id = instance.n8n_error_workflow_id
+                if stored_workflow_id:
+                    workflow_id = await self._update_workflow(client, instance.url, headers, stored_workflow_id, workflow_body)
+                
+                if workflow_id is None:
+                    # Not tracked yet, or deleted in n8n: check if one exists by name
+                    existing_workflow_id = await self._find_workflow_id(client, instance.url, api_key, workflow_name)
+                    if existing_workflow_id and existing_workflow_id != stored_workflow_id:
+                        workflow_id = await self._update_workflow(client, instance.url, headers, existing_workflow_id, workflow_body)
+                
+                is_update = workflow_id is not None
+                
+                if workflow_id is None:
+                    # Create new workflow (not retried: a repeated POST could create a duplicate)
+                    create_response = await client.post(
+                        f"{instance.url}/api/v1/workflows",
+                        headers=headers,
+                        content=workflow_body
+                    )
+                    
+                    if create_response.status_code == 200:
+                        workflow_data = orjson.loads(create_response.content).get('data', {})
+                        workflow_id = workflow_data.get('id')
+                        self.logger.info("create_workflow_in_n8n: Created workflow - id: %s", workflow_id)
                     else:
-                        # Create new workflow
-                        create_response = await client.post(
-                            f"{instance.url}/api/v1/workflows",
-                            headers={
-                                "X-N8N-API-KEY": api_key,
-                                "Content-Type": "application/json"
-                            },
-                            json=workflow_template
-                        )
-                        
-                        if create_response.status_code == 200:
-                            workflow_data = create_response.json().get('data', {})
-                            workflow_id = workflow_data.get('id')
-                            self.logger.info(f"create_workflow_in_n8n: Created workflow - id: {workflow_id}")
-                        else:
-                            raise Exception(f"Failed to create workflow: {create_response.status_code} - {create_response.text}")
+                        raise Exception(f"Failed to create workflow: {create_response.status_code} - {create_response.text}")
             except httpx.TimeoutException:
                 self.analytics.log_failure(
                     action='create_workflow_in_n8n',
@@ -413,19 +546,28 @@ class ErrorWorkflowService:
             
             # Activate the workflow
             try:
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    activate_response = await client.post(
-                        f"{instance.url}/api/v1/workflows/{workflow_id}/activate",
-                        headers={"X-N8N-API-KEY": api_key}
-                    )
-                    
-                    if activate_response.status_code not in [200, 204]:
-                        self.logger.warning(f"create_workflow_in_n8n: Failed to activate workflow - {activate_response.status_code}")
-                        # Don't fail the whole operation if activation fails
+                activate_response = await _with_retry(
+                    client.post,
+                    f"{instance.url}/api/v1/workflows/{workflow_id}/activate",
+                    headers={"X-N8N-API-KEY": api_key}
+                )
+                
+                if activate_response.status_code not in [200, 204]:
+                    self.logger.warning("create_workflow_in_n8n: Failed to activate workflow - %s", activate_response.status_code)
+                    # Don't fail the whole operation if activation fails
             except Exception as e:
-                self.logger.warning(f"create_workflow_in_n8n: Could not activate workflow - {e}")
+                self.logger.warning("create_workflow_in_n8n: Could not activate workflow - %s", e)
                 # Don't fail the whole operation
             
+            # Remember the workflow so the next sync can update it directly
+            if instance.n8n_error_workflow_id != workflow_id:
+                try:
+                    instance.n8n_error_workflow_id = workflow_id
+                    db.commit()
+                except Exception as e:
+                    db.rollback()
+                    self.logger.warning("create_workflow_in_n8n: Could not save workflow id - %s", e)
+            
             # Success!
             result = {
                 "status": "success",
@@ -435,7 +577,7 @@ class ErrorWorkflowService:
                 "is_update": is_update
             }
             
-            effective_plan = user.plan_tier + (" (Tester)" if user.is_tester else "")
+            effective_plan = plan_tier + (" (Tester)" if is_tester else "")
             self.analytics.log_success(
                 action='create_workflow_in_n8n',
                 user_id=user_id,
@@ -447,7 +589,7 @@ class ErrorWorkflowService:
                 }
             )
             
-            self.logger.info(f"create_workflow_in_n8n: Success - workflow_id: {workflow_id}, is_update: {is_update}")
+            self.logger.info("create_workflow_in_n8n: Success - workflow_id: %s, is_update: %s", workflow_id, is_update)
             return result
             
         except HTTPException:
@@ -459,7 +601,7 @@ class ErrorWorkflowService:
                 user_id=user_id,
                 parameters={'instance_id': instance_id}
             )
-            self.logger.error(f"create_workflow_in_n8n: Failure - {e}")
+            self.logger.error("create_workflow_in_n8n: Failure - %s", e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Unexpected error: {str(e)}"
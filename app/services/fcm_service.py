@@ -1,10 +1,11 @@
+import asyncio
 import httpx
+import orjson
 from app.core.config import settings
 from app.core.firebase import get_firestore_client, get_fcm_access_token
 from app.models.fcm_notification import (
     FCMNotificationData,
     FCMNotificationPayload,
-    FCMMessage,
     FCMAndroidConfig,
     FCMApnsConfig
 )
@@ -14,6 +15,55 @@ from typing import Literal, Optional
 
 logger = logging.getLogger(__name__)
 
+# Platform configs for data-only messages, built once and shared by every send.
+# model_construct skips validation: these are fixed, server-controlled values.
+_ANDROID_DEFAULT = FCMAndroidConfig.model_construct(
+    priority="high",
+    notification=None  # No notification config for data-only messages
+)
+_APNS_DEFAULT = FCMApnsConfig.model_construct(
+    headers={"apns-priority": "10"},
+    payload={
+        "aps": {
+            "content-available": 1,  # Required for data-only messages on iOS
+            "sound": "default",
+            "badge": 1
+        }
+    }
+)
+# Wire-format copies of the above, merged into every request body as plain dicts
+_ANDROID_CONFIG = _ANDROID_DEFAULT.model_dump(exclude_none=True)
+_APNS_CONFIG = _APNS_DEFAULT.model_dump(exclude_none=True)
+
+# Per-device sends share one HTTP/2 connection to FCM; keep it open between webhooks
+FCM_CLIENT_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+FCM_CLIENT_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+_fcm_client: Optional[httpx.AsyncClient] = None
+# FCM rejects unregistered or malformed tokens with these statuses
+INVALID_TOKEN_STATUS_CODES = (400, 404)
+# Firestore caps a WriteBatch at 500 operations
+FIRESTORE_BATCH_LIMIT = 500
+# Upper bound on one notification's in-flight sends, for users with many devices
+FCM_MAX_CONCURRENT_SENDS = 20
+# FCM rejects data payloads over 4KB; long error messages are cut to this many characters
+FCM_ERROR_MESSAGE_MAX_LENGTH = 1024
+
+
+def get_fcm_client() -> httpx.AsyncClient:
+    """Process-wide HTTP client for FCM, created on first use so it binds to the running event loop"""
+    global _fcm_client
+    if _fcm_client is None or _fcm_client.is_closed:
+        _fcm_client = httpx.AsyncClient(http2=True, limits=FCM_CLIENT_LIMITS, timeout=FCM_CLIENT_TIMEOUT)
+    return _fcm_client
+
+
+async def close_fcm_client():
+    """Close the shared FCM HTTP client"""
+    global _fcm_client
+    if _fcm_client is not None:
+        await _fcm_client.aclose()
+        _fcm_client = None
+
 
 class FCMService:
     def __init__(self):
@@ -31,43 +81,115 @@ class FCMService:
         Returns:
             List of dictionaries with 'token' and 'device_id' keys
         """
-        self.logger.info(f"get_user_device_tokens: Entry - user: {user_id}")
+        self.logger.info("get_user_device_tokens: Entry - user: %s", user_id)
         
         try:
-            devices_ref = self.db.collection('users').document(user_id).collection('devices')
-            devices_docs = devices_ref.stream()
-            
-            tokens = []
-            for doc in devices_docs:
-                device_data = doc.to_dict()
-                fcm_token = device_data.get('fcm_token')
-                if fcm_token:
-                    tokens.append({
-                        'token': fcm_token,
-                        'device_id': doc.id
-                    })
-            
-            self.logger.info(f"get_user_device_tokens: Success - user: {user_id}, count: {len(tokens)}")
+            user_ref = self.db.collection('users').document(user_id)
+            
+            # Registration mirrors each device's token into one map on the user document,
+            # so a single read covers every device. The map is only used once registration
+            # has marked it complete (copied in devices registered before the map existed)
+            user_doc = user_ref.get(field_paths=['device_tokens', 'device_tokens_complete'])
+            user_data = user_doc.to_dict() if user_doc.exists else None
+            
+            if user_data and user_data.get('device_tokens_complete'):
+                tokens = [
+                    {'token': fcm_token, 'device_id': device_id}
+                    for device_id, fcm_token in (user_data.get('device_tokens') or {}).items()
+                    if fcm_token
+                ]
+            else:
+                # Map missing or not yet complete: read the devices.
+                # Only the token is needed; Firestore sends back just that field (doc.id is always included)
+                devices_docs = user_ref.collection('devices').select(['fcm_token']).stream()
+                
+                tokens = []
+                for doc in devices_docs:
+                    try:
+                        fcm_token = doc.get('fcm_token')
+                    except KeyError:
+                        fcm_token = None
+                    if fcm_token:
+                        tokens.append({
+                            'token': fcm_token,
+                            'device_id': doc.id
+                        })
+            
+            self.logger.info("get_user_device_tokens: Success - user: %s, count: %s", user_id, len(tokens))
             return tokens
         except Exception as e:
-            self.logger.error(f"get_user_device_tokens: Failure - {e}")
+            self.logger.error("get_user_device_tokens: Failure - %s", e)
             return []
     
-    def remove_invalid_device_token(self, user_id: str, device_id: str):
-        """Remove invalid device token from Firestore
+    def remove_invalid_device_tokens(self, user_id: str, device_ids: list):
+        """Remove invalid device tokens from Firestore
+        
+        Deletes go out in WriteBatches of up to FIRESTORE_BATCH_LIMIT writes, and also
+        remove the devices from the user's token map.
         
         Args:
             user_id: Firebase UID
-            device_id: Device identifier
+            device_ids: Device identifiers
         """
-        self.logger.info(f"remove_invalid_device_token: Entry - user: {user_id}, device: {device_id}")
+        self.logger.info("remove_invalid_device_tokens: Entry - user: %s, devices: %s", user_id, device_ids)
+        
+        try:
+            user_ref = self.db.collection('users').document(user_id)
+            devices_ref = user_ref.collection('devices')
+            # Each batch also drops its devices from the user's token map (one more write)
+            chunk_size = FIRESTORE_BATCH_LIMIT - 1
+            for start in range(0, len(device_ids), chunk_size):
+                chunk = device_ids[start:start + chunk_size]
+                batch = self.db.batch()
+                for device_id in chunk:
+                    batch.delete(devices_ref.document(device_id))
+                batch.set(user_ref, {
+                    'device_tokens': {device_id: firestore.DELETE_FIELD for device_id in chunk}
+                }, merge=True)
+                batch.commit()
+            self.logger.info("remove_invalid_device_tokens: Success - user: %s, count: %s", user_id, len(device_ids))
+        except Exception as e:
+            self.logger.error("remove_invalid_device_tokens: Failure - %s", e)
+    
+    async def _send_to_device(self, device: dict, headers: dict, data: dict) -> Optional[int]:
+        """Send one data-only message to a device
         
+        Returns:
+            FCM's HTTP status code, or None if no response was received
+        """
         try:
-            device_ref = self.db.collection('users').document(user_id).collection('devices').document(device_id)
-            device_ref.delete()
-            self.logger.info(f"remove_invalid_device_token: Success - user: {user_id}, device: {device_id}")
+            # Build the FCM message (data-only notification) as plain dicts in the
+            # FCMMessage wire shape and encode once with orjson
+            # Data-only messages give the app full control over notification display
+            body = orjson.dumps({
+                "message": {
+                    "token": device['token'],
+                    "data": data,
+                    "android": _ANDROID_CONFIG,
+                    "apns": _APNS_CONFIG
+                }
+            })
+            
+            # Send notification using FCM HTTP v1 API
+            response = await get_fcm_client().post(
+                self.fcm_url,
+                headers=headers,
+                content=body
+            )
+            response.raise_for_status()
+            self.logger.info("send_error_notification: Sent to device: %s", device['device_id'])
+            return response.status_code
+            
+        except httpx.HTTPStatusError as e:
+            # If token is invalid (404 or 400), the caller removes it from Firestore
+            if e.response.status_code in INVALID_TOKEN_STATUS_CODES:
+                self.logger.warning("send_error_notification: Invalid token for device: %s, removing", device['device_id'])
+            else:
+                self.logger.error("send_error_notification: Failed for device: %s, error: %s", device['device_id'], e)
+            return e.response.status_code
         except Exception as e:
-            self.logger.error(f"remove_invalid_device_token: Failure - {e}")
+            self.logger.error("send_error_notification: Failed for device: %s, error: %s", device['device_id'], e)
+            return None
     
     async def send_error_notification(
         self,
@@ -91,14 +213,15 @@ class FCMService:
             severity: Notification severity level (info, warning, error, critical)
             workflow_name: Optional human-readable workflow name
         """
-        self.logger.info(f"send_error_notification: Entry - user: {user_id}, execution: {execution_id}, severity: {severity}")
+        self.logger.info("send_error_notification: Entry - user: %s, execution: %s, severity: %s", user_id, execution_id, severity)
         
         try:
             # Get all FCM tokens for user's devices
-            device_tokens = self.get_user_device_tokens(user_id)
+            # The Firestore client is synchronous; read in a worker thread to keep the event loop free
+            device_tokens = await asyncio.to_thread(self.get_user_device_tokens, user_id)
             
             if not device_tokens:
-                self.logger.warning(f"send_error_notification: No FCM tokens for user: {user_id}")
+                self.logger.warning("send_error_notification: No FCM tokens for user: %s", user_id)
                 return
             
             # Create notification title and body for data payload
@@ -108,12 +231,16 @@ class FCMService:
             elif severity == "warning":
                 notification_title = "⚠️ Workflow Warning"
             
+            # Cap the message once: it is sent to every device
+            error_message = error_message[:FCM_ERROR_MESSAGE_MAX_LENGTH]
+            
             workflow_display = workflow_name if workflow_name else workflow_id
             notification_body = f"Workflow {workflow_display} failed: {error_message[:100]}"
             
             # Create notification data payload (data-only notification)
             # Include title and body in data so app can display them
-            notification_data = FCMNotificationData(
+            # Fields come from the validated webhook request and server-side strings
+            notification_data = FCMNotificationData.model_construct(
                 type="workflow_error",
                 workflow_id=workflow_id,
                 execution_id=execution_id,
@@ -126,71 +253,45 @@ class FCMService:
             )
             
             # Get OAuth2 token once for all requests
-            access_token = get_fcm_access_token()
+            # (off the event loop: an expired token is refreshed over HTTPS)
+            access_token = await asyncio.to_thread(get_fcm_access_token)
             
-            # Send notification to all user devices
-            success_count = 0
-            failed_count = 0
+            headers = {
+                "Authorization": f"Bearer {access_token}",
+                "Content-Type": "application/json"
+            }
             
-            async with httpx.AsyncClient() as client:
-                for device in device_tokens:
-                    try:
-                        # Create FCM message using Pydantic model (data-only notification)
-                        # Data-only messages give the app full control over notification display
-                        fcm_message = FCMMessage(
-                            token=device['token'],
-                            notification=None,  # Data-only notification
-                            data={k: str(v) for k, v in notification_data.model_dump().items() if v is not None},
-                            android=FCMAndroidConfig(
-                                priority="high",
-                                # No notification config for data-only messages
-                            ),
-                            apns=FCMApnsConfig(
-                                headers={"apns-priority": "10"},
-                                payload={
-                                    "aps": {
-                                        "content-available": 1,  # Required for data-only messages on iOS
-                                        "sound": "default",
-                                        "badge": 1
-                                    }
-                                }
-                            )
-                        )
-                        
-                        # Prepare message for FCM API
-                        message = {
-                            "message": fcm_message.model_dump(exclude_none=True)
-                        }
-                        
-                        # Send notification using FCM HTTP v1 API
-                        response = await client.post(
-                            self.fcm_url,
-                            headers={
-                                "Authorization": f"Bearer {access_token}",
-                                "Content-Type": "application/json"
-                            },
-                            json=message,
-                            timeout=30.0
-                        )
-                        response.raise_for_status()
-                        success_count += 1
-                        self.logger.info(f"send_error_notification: Sent to device: {device['device_id']}")
-                        
-                    except httpx.HTTPStatusError as e:
-                        failed_count += 1
-                        # If token is invalid (404 or 400), remove it from Firestore
-                        if e.response.status_code in [404, 400]:
-                            self.logger.warning(f"send_error_notification: Invalid token for device: {device['device_id']}, removing")
-                            self.remove_invalid_device_token(user_id, device['device_id'])
-                        else:
-                            self.logger.error(f"send_error_notification: Failed for device: {device['device_id']}, error: {e}")
-                    except Exception as e:
-                        failed_count += 1
-                        self.logger.error(f"send_error_notification: Failed for device: {device['device_id']}, error: {e}")
-            
-            self.logger.info(f"send_error_notification: Complete - user: {user_id}, success: {success_count}, failed: {failed_count}")
+            # Every device gets the same data payload; only the token differs.
+            # JSON mode leaves plain strings (FCM data values must be strings), including
+            # severity when callers pass the webhook's Severity enum
+            data = notification_data.model_dump(exclude_none=True, mode='json')
+            
+            # Devices registered with the same token would receive the message twice
+            unique_devices = list({device['token']: device for device in device_tokens}.values())
+            
+            # Send to all user devices concurrently over the shared connection
+            semaphore = asyncio.Semaphore(FCM_MAX_CONCURRENT_SENDS)
+            
+            async def send(device: dict) -> Optional[int]:
+                async with semaphore:
+                    return await self._send_to_device(device, headers, data)
+            
+            results = await asyncio.gather(*[send(device) for device in unique_devices])
+            success_count = sum(1 for status_code in results if status_code is not None and status_code < 300)
+            failed_count = len(results) - success_count
+            
+            # Tokens FCM rejected are deleted together, off the event loop
+            invalid_device_ids = [
+                device['device_id']
+                for device, status_code in zip(unique_devices, results)
+                if status_code in INVALID_TOKEN_STATUS_CODES
+            ]
+            if invalid_device_ids:
+                await asyncio.to_thread(self.remove_invalid_device_tokens, user_id, invalid_device_ids)
+            
+            self.logger.info("send_error_notification: Complete - user: %s, success: %s, failed: %s", user_id, success_count, failed_count)
         except Exception as e:
-            self.logger.error(f"send_error_notification: Failure - {e}")
+            self.logger.error("send_error_notification: Failure - %s", e)
             # Don't raise - notification failures shouldn't break webhook processing
             pass
 
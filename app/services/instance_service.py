@@ -1,34 +1,53 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload, undefer
 from app.models.n8n_instance import N8NInstance
 from app.models.user import User
 from app.core.security import encrypt_api_key, decrypt_api_key
 from app.services.analytics_service import AnalyticsService
 from app.services.subscription_service import PlanConfiguration
 from app.core.cache import get_cache
-from datetime import datetime
+from datetime import datetime, timedelta
 from fastapi import HTTPException, status
+from typing import NamedTuple, Optional
+import time
 import uuid
 import logging
 
 logger = logging.getLogger(__name__)
 
+# n8n fires many error webhooks per instance; keep the instance fields they need this long
+WEBHOOK_INSTANCE_CACHE_TTL_SECONDS = 30
+
+
+class WebhookInstance(NamedTuple):
+    """Instance fields the n8n error webhook needs (plain values, safe to cache)"""
+    id: str
+    user_id: str
+    enabled: bool
+
 
 class InstanceService:
+    # instance_id -> (expires_at, WebhookInstance)
+    _webhook_cache: dict[str, tuple[float, WebhookInstance]] = {}
+    
     def __init__(self):
         self.analytics = AnalyticsService()
         self.logger = logging.getLogger(__name__)
     
-    def get_instance(self, db: Session, instance_id: str, user_id: str) -> N8NInstance:
-        """Get n8n instance by ID, ensuring user owns it"""
-        self.logger.info(f"get_instance: Entry - instance: {instance_id}, user: {user_id}")
+    def get_instance(self, db: Session, instance_id: str, user_id: str, with_api_key: bool = False) -> N8NInstance:
+        """Get n8n instance by ID, ensuring user owns it
+        
+        Pass with_api_key=True when the caller will decrypt the API key, so the
+        deferred column is loaded in the same query.
+        """
+        self.logger.info("get_instance: Entry - instance: %s, user: %s", instance_id, user_id)
         
         try:
-            instance = db.query(N8NInstance).filter(
-                N8NInstance.id == instance_id,
-                N8NInstance.user_id == user_id
-            ).first()
+            # Primary-key lookup: served from the session's identity map when already loaded
+            options = [undefer(N8NInstance.api_key_encrypted)] if with_api_key else None
+            instance = db.get(N8NInstance, instance_id, options=options)
             
-            if not instance:
+            # Another user's instance gets the same 404 as a missing one
+            if not instance or instance.user_id != user_id:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="Instance not found"
@@ -39,7 +58,7 @@ class InstanceService:
                 user_id=user_id,
                 parameters={'instance_id': instance_id}
             )
-            self.logger.info(f"get_instance: Success - instance: {instance_id}")
+            self.logger.info("get_instance: Success - instance: %s", instance_id)
             return instance
         except HTTPException:
             raise
@@ -50,17 +69,20 @@ class InstanceService:
                 user_id=user_id,
                 parameters={'instance_id': instance_id}
             )
-            self.logger.error(f"get_instance: Failure - {e}")
+            self.logger.error("get_instance: Failure - %s", e)
             raise
     
-    def get_instance_by_id(self, db: Session, instance_id: str) -> N8NInstance:
-        """Get n8n instance by ID only (for webhooks)"""
-        self.logger.info(f"get_instance_by_id: Entry - instance: {instance_id}")
+    def get_instance_by_id(self, db: Session, instance_id: str, with_user: bool = False) -> N8NInstance:
+        """Get n8n instance by ID only (for webhooks)
+        
+        Pass with_user=True to load the owning user in the same query
+        (instance.user raises otherwise).
+        """
+        self.logger.info("get_instance_by_id: Entry - instance: %s", instance_id)
         
         try:
-            instance = db.query(N8NInstance).filter(
-                N8NInstance.id == instance_id
-            ).first()
+            options = [joinedload(N8NInstance.user)] if with_user else None
+            instance = db.get(N8NInstance, instance_id, options=options)
             
             if not instance:
                 raise HTTPException(
@@ -68,17 +90,42 @@ class InstanceService:
                     detail="Instance not found"
                 )
             
-            self.logger.info(f"get_instance_by_id: Success - instance: {instance_id}")
+            self.logger.info("get_instance_by_id: Success - instance: %s", instance_id)
             return instance
         except HTTPException:
             raise
         except Exception as e:
-            self.logger.error(f"get_instance_by_id: Failure - {e}")
+            self.logger.error("get_instance_by_id: Failure - %s", e)
             raise
     
+    def get_webhook_target(self, db: Session, instance_id: str) -> tuple[WebhookInstance, Optional[User]]:
+        """Get an instance and its owner for the n8n error webhook
+        
+        Instance fields are cached for WEBHOOK_INSTANCE_CACHE_TTL_SECONDS. The owner
+        is always read from the session so plan changes apply immediately.
+        
+        Returns:
+            (instance fields, owning user or None)
+        """
+        now = time.monotonic()
+        cached = self._webhook_cache.get(instance_id)
+        if cached and cached[0] > now:
+            instance = cached[1]
+            return instance, db.get(User, instance.user_id)
+        
+        loaded = self.get_instance_by_id(db, instance_id, with_user=True)
+        instance = WebhookInstance(loaded.id, loaded.user_id, loaded.enabled)
+        self._webhook_cache[instance_id] = (now + WEBHOOK_INSTANCE_CACHE_TTL_SECONDS, instance)
+        return instance, loaded.user
+    
+    @classmethod
+    def invalidate_webhook_cache(cls, instance_id: str):
+        """Drop cached webhook fields for an instance (call after changing it)"""
+        cls._webhook_cache.pop(instance_id, None)
+    
     def list_instances(self, db: Session, user_id: str) -> list[N8NInstance]:
         """List all n8n instances for a user"""
-        self.logger.info(f"list_instances: Entry - user: {user_id}")
+        self.logger.info("list_instances: Entry - user: %s", user_id)
         
         try:
             instances = db.query(N8NInstance).filter(
@@ -90,7 +137,7 @@ class InstanceService:
                 user_id=user_id,
                 parameters={'count': len(instances)}
             )
-            self.logger.info(f"list_instances: Success - user: {user_id}, count: {len(instances)}")
+            self.logger.info("list_instances: Success - user: %s, count: %s", user_id, len(instances))
             return instances
         except Exception as e:
             self.analytics.log_failure(
@@ -98,7 +145,7 @@ class InstanceService:
                 error=str(e),
                 user_id=user_id
             )
-            self.logger.error(f"list_instances: Failure - {e}")
+            self.logger.error("list_instances: Failure - %s", e)
             raise
     
     def create_instance(
@@ -111,17 +158,20 @@ class InstanceService:
         enabled: bool = True
     ) -> N8NInstance:
         """Create a new n8n instance"""
-        self.logger.info(f"create_instance: Entry - user: {user_id}, name: {name}, enabled: {enabled}")
+        self.logger.info("create_instance: Entry - user: %s, name: %s, enabled: %s", user_id, name, enabled)
         
+        # Today's creation counter, once this request has been counted against it
+        reserved_key = None
         try:
             # Ensure user exists
-            user = db.query(User).filter(User.id == user_id).first()
+            user = db.get(User, user_id)
             if not user:
                 # Create user if doesn't exist
                 user = User(
                     id=user_id,
                     email="",  # Will be updated from token
-                    is_active=True
+                    is_active=True,
+                    instance_count=0
                 )
                 db.add(user)
                 db.flush()
@@ -129,14 +179,10 @@ class InstanceService:
             # Testers get unlimited instances (handled by quota check above)
             if not user.is_tester:
                 # Check instance limit based on plan
-                existing_instances = db.query(N8NInstance).filter(
-                    N8NInstance.user_id == user_id
-                ).count()
-                
                 plan_config = PlanConfiguration.get_plan(db, user.plan_tier, user=user)
                 max_instances = plan_config.get('max_instances', 1)
                 
-                if max_instances != -1 and existing_instances >= max_instances:
+                if max_instances != -1 and user.instance_count >= max_instances:
                     raise HTTPException(
                         status_code=status.HTTP_403_FORBIDDEN,
                         detail=f"Instance limit reached. Your {plan_config['name']} plan allows {max_instances} instance(s). Upgrade to add more instances."
@@ -144,11 +190,13 @@ class InstanceService:
                 
                 # Check rate limit for free users (max 1 creation per day)
                 if user.plan_tier == 'free':
-                    if not self._check_instance_creation_rate_limit(user_id):
+                    allowed, cache_key = self._reserve_instance_creation(user_id)
+                    if not allowed:
                         raise HTTPException(
-                        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                        detail="Free users can create 1 instance per day. Please try again tomorrow or upgrade your plan."
-                    )
+                            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                            detail="Free users can create 1 instance per day. Please try again tomorrow or upgrade your plan."
+                        )
+                    reserved_key = cache_key
             
             # Encrypt API key
             encrypted_key = encrypt_api_key(api_key)
@@ -163,30 +211,30 @@ class InstanceService:
             )
             
             db.add(instance)
+            # SQL-side increment (instance_count = instance_count + 1), committed with the insert
+            user.instance_count = User.instance_count + 1
             db.commit()
             db.refresh(instance)
             
-            # Increment instance creation count for free users (not testers)
-            # Testers have unlimited instances, so no tracking needed
-            if user.plan_tier == 'free' and not user.is_tester:
-                self._increment_instance_creation_count(user_id)
-            
             self.analytics.log_success(
                 action='create_instance',
                 user_id=user_id,
                 parameters={'instance_id': instance.id, 'name': name}
             )
-            self.logger.info(f"create_instance: Success - instance: {instance.id}")
+            self.logger.info("create_instance: Success - instance: %s", instance.id)
             return instance
         except Exception as e:
             db.rollback()
+            # The instance was not created, so it doesn't count towards today's limit
+            if reserved_key:
+                get_cache().incr(reserved_key, -1)
             self.analytics.log_failure(
                 action='create_instance',
                 error=str(e),
                 user_id=user_id,
                 parameters={'name': name, 'url': url}
             )
-            self.logger.error(f"create_instance: Failure - {e}")
+            self.logger.error("create_instance: Failure - %s", e)
             raise
     
     def update_instance(
@@ -200,7 +248,7 @@ class InstanceService:
         enabled: bool = None
     ) -> N8NInstance:
         """Update an existing n8n instance"""
-        self.logger.info(f"update_instance: Entry - instance: {instance_id}, user: {user_id}")
+        self.logger.info("update_instance: Entry - instance: %s, user: %s", instance_id, user_id)
         
         try:
             instance = self.get_instance(db, instance_id, user_id)
@@ -216,13 +264,14 @@ class InstanceService:
             
             db.commit()
             db.refresh(instance)
+            self.invalidate_webhook_cache(instance_id)
             
             self.analytics.log_success(
                 action='update_instance',
                 user_id=user_id,
                 parameters={'instance_id': instance_id}
             )
-            self.logger.info(f"update_instance: Success - instance: {instance_id}")
+            self.logger.info("update_instance: Success - instance: %s", instance_id)
             return instance
         except HTTPException:
             raise
@@ -234,24 +283,29 @@ class InstanceService:
                 user_id=user_id,
                 parameters={'instance_id': instance_id}
             )
-            self.logger.error(f"update_instance: Failure - {e}")
+            self.logger.error("update_instance: Failure - %s", e)
             raise
     
     def delete_instance(self, db: Session, instance_id: str, user_id: str):
         """Delete an n8n instance"""
-        self.logger.info(f"delete_instance: Entry - instance: {instance_id}, user: {user_id}")
+        self.logger.info("delete_instance: Entry - instance: %s, user: %s", instance_id, user_id)
         
         try:
             instance = self.get_instance(db, instance_id, user_id)
             db.delete(instance)
+            db.query(User).filter(User.id == user_id).update(
+                {User.instance_count: User.instance_count - 1},
+                synchronize_session=False
+            )
             db.commit()
+            self.invalidate_webhook_cache(instance_id)
             
             self.analytics.log_success(
                 action='delete_instance',
                 user_id=user_id,
                 parameters={'instance_id': instance_id}
             )
-            self.logger.info(f"delete_instance: Success - instance: {instance_id}")
+            self.logger.info("delete_instance: Success - instance: %s", instance_id)
         except HTTPException:
             raise
         except Exception as e:
@@ -262,39 +316,27 @@ class InstanceService:
                 user_id=user_id,
                 parameters={'instance_id': instance_id}
             )
-            self.logger.error(f"delete_instance: Failure - {e}")
+            self.logger.error("delete_instance: Failure - %s", e)
             raise
     
-    def _check_instance_creation_rate_limit(self, user_id: str) -> bool:
-        """Check if free user can create instance (max 1 per day)."""
-        cache = get_cache()
-        today = datetime.utcnow().date().isoformat()
-        cache_key = f"instance_creation:{user_id}:{today}"
+    def _reserve_instance_creation(self, user_id: str) -> tuple[bool, str]:
+        """Count an instance creation for a free user (max 1 per day).
         
-        cached_count = cache.get(cache_key)
-        if cached_count is None:
-            cached_count = 0
+        A single atomic increment both checks and records the creation, so
+        concurrent requests cannot both get through.
         
-        # Free users: max 1 creation per day
-        if cached_count >= 1:
-            return False
-        
-        # Increment count (will be set when instance is successfully created)
-        return True
-    
-    def _increment_instance_creation_count(self, user_id: str):
-        """Increment instance creation count for rate limiting."""
-        cache = get_cache()
-        today = datetime.utcnow().date().isoformat()
-        cache_key = f"instance_creation:{user_id}:{today}"
+        Returns:
+            (allowed, counter key) - decrement the key if the creation then fails
+        """
+        now = datetime.utcnow()
+        cache_key = f"instance_creation:{user_id}:{now.date().isoformat()}"
         
-        cached_count = cache.get(cache_key)
-        if cached_count is None:
-            cached_count = 0
+        # Keep the counter until the next UTC midnight
+        midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        count = get_cache().incr_with_ttl(cache_key, 1, int((midnight - now).total_seconds()) + 1)
         
-        # Store for 24 hours (until end of day)
-        hours_until_midnight = 24 - datetime.utcnow().hour
-        cache.set(cache_key, cached_count + 1, ttl_minutes=hours_until_midnight * 60)
+        # Redis unavailable (None): don't block creation
+        return count is None or count <= 1, cache_key
     
     def get_decrypted_api_key(self, instance: N8NInstance) -> str:
         """Get decrypted API key for an instance"""
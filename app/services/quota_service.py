@@ -1,12 +1,13 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, func
+from sqlalchemy.dialects.postgresql import insert
 from app.models.quota import Quota
 from app.models.user import User
 from app.services.analytics_service import AnalyticsService
 from app.services.subscription_service import PlanConfiguration
 from app.core.cache import get_cache
+from app.core.database import UTC_NOW
 from datetime import date
-import uuid
 import logging
 
 logger = logging.getLogger(__name__)
@@ -92,22 +93,14 @@ class QuotaService:
                     )
                 ).first()
                 
-                if not quota:
-                    # Create new quota for today
-                    quota = Quota(
-                        id=str(uuid.uuid4()),
-                        user_id=user_id,
-                        quota_type=quota_type,
-                        quota_date=today,
-                        count=0
-                    )
-                    db.add(quota)
+                # No row yet means nothing used today; increment_quota creates it
+                current_count = quota.count if quota else 0
                 
-                if quota.count >= limit:
+                if current_count >= limit:
                     self.logger.info(f"check_quota: Quota exceeded - user: {user_id}, type: {quota_type}, plan: {user.plan_tier}")
                     return {'allowed': False, 'is_tester': False, 'user': user}
                 
-                self.logger.info(f"check_quota: Success - user: {user_id}, type: {quota_type}, count: {quota.count}/{limit}, plan: {user.plan_tier}")
+                self.logger.info(f"check_quota: Success - user: {user_id}, type: {quota_type}, count: {current_count}/{limit}, plan: {user.plan_tier}")
                 return {'allowed': True, 'is_tester': False, 'user': user}
             finally:
                 # Always release lock
@@ -184,12 +177,12 @@ class QuotaService:
         user: User = None  # Optional: pass user object from check_quota to avoid duplicate query
     ):
         """
-        Increment quota count atomically using Redis distributed lock.
+        Increment quota count atomically with a single INSERT ... ON CONFLICT DO UPDATE.
         If user object is provided (from check_quota), it will be reused to avoid duplicate query.
         Automatically skips increment for testers (they have unlimited access).
         
-        Uses Redis distributed lock to ensure atomic increment operations and prevent
-        race conditions where multiple concurrent requests could bypass quota limits.
+        The upsert on the (user_id, quota_type, quota_date) unique constraint is atomic
+        in Postgres, so concurrent requests can't lose increments and no Redis lock is needed.
         """
         self.logger.info(f"increment_quota: Entry - user: {user_id}, type: {quota_type}")
         
@@ -203,56 +196,29 @@ class QuotaService:
                 self.logger.info(f"increment_quota: Skipped (tester) - user: {user_id}, type: {quota_type}")
                 return
             
-            # Use Redis distributed lock to prevent race conditions
-            cache = get_cache()
-            today = date.today()
-            lock_key = f"quota_lock:{user_id}:{quota_type}:{today}"
+            stmt = insert(Quota).values(
+                user_id=user_id,
+                quota_type=quota_type,
+                quota_date=date.today(),
+                count=1
+            ).on_conflict_do_update(
+                constraint="uq_quota_daily",
+                set_={"count": func.coalesce(Quota.count, 0) + 1, "updated_at": UTC_NOW}
+            ).returning(Quota.count)
+            count = db.execute(stmt).scalar_one()
             
-            # Try to acquire lock (wait up to 5 seconds)
-            lock_acquired = cache.acquire_lock(lock_key, timeout_seconds=10, block_seconds=5)
+            # Increment hourly quota for free users (not testers)
+            if user and user.plan_tier == 'free':
+                self._increment_hourly_quota(user_id, quota_type)
             
-            try:
-                if not lock_acquired:
-                    # If we can't get the lock, log warning but still increment
-                    # This is safer than failing silently
-                    self.logger.warning(f"increment_quota: Could not acquire lock - {user_id}, {quota_type}")
-                
-                quota = db.query(Quota).filter(
-                    and_(
-                        Quota.user_id == user_id,
-                        Quota.quota_type == quota_type,
-                        Quota.quota_date == today
-                    )
-                ).first()
-                
-                if not quota:
-                    quota = Quota(
-                        id=str(uuid.uuid4()),
-                        user_id=user_id,
-                        quota_type=quota_type,
-                        quota_date=today,
-                        count=1
-                    )
-                    db.add(quota)
-                else:
-                    quota.count += 1
-                
-                # Increment hourly quota for free users (not testers)
-                if user and user.plan_tier == 'free':
-                    self._increment_hourly_quota(user_id, quota_type)
-                
-                db.commit()
-                
-                self.analytics.log_success(
-                    action='increment_quota',
-                    user_id=user_id,
-                    parameters={'quota_type': quota_type, 'count': quota.count}
-                )
-                self.logger.info(f"increment_quota: Success - user: {user_id}, type: {quota_type}, count: {quota.count}")
-            finally:
-                # Always release lock
-                if lock_acquired:
-                    cache.release_lock(lock_key)
+            db.commit()
+            
+            self.analytics.log_success(
+                action='increment_quota',
+                user_id=user_id,
+                parameters={'quota_type': quota_type, 'count': count}
+            )
+            self.logger.info(f"increment_quota: Success - user: {user_id}, type: {quota_type}, count: {count}")
         except Exception as e:
             db.rollback()
             self.analytics.log_failure(
@@ -1,7 +1,8 @@
-import json
 import logging
+import time
 import uuid
 from datetime import datetime, timedelta
+from typing import Optional
 
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
@@ -9,12 +10,15 @@ from sqlalchemy.orm import Session
 from app.models.plan import Plan
 from app.models.subscription import (BillingPeriod, Platform, Subscription,
                                      SubscriptionStatus)
-from app.models.subscription_history import SubscriptionHistory
+from app.models.subscription_history import HistoryAction, SubscriptionHistory
 from app.models.user import User
 from app.services.analytics_service import AnalyticsService
 
 logger = logging.getLogger(__name__)
 
+# Plans change rarely; keep them in-process for this long before re-reading the table
+PLAN_CACHE_TTL_SECONDS = 60
+
 
 class PlanLimits(BaseModel):
     """Pydantic model for plan limits"""
@@ -44,28 +48,60 @@ class PlanResponse(BaseModel):
 class PlanConfiguration:
     """Legacy plan configuration - kept for backward compatibility during migration"""
 
+    # plan_tier -> (expires_at, plan snapshot). Snapshots are plain dicts so no
+    # session-bound ORM objects outlive the request that loaded them.
+    _cache: dict[str, tuple[float, dict]] = {}
+
+    @classmethod
+    def _load_plan(cls, db: Session, plan_tier: str) -> Optional[dict]:
+        """Get a plan snapshot from the in-process cache, falling back to free if not found"""
+        plan_tier = plan_tier.lower()
+        now = time.monotonic()
+        cached = cls._cache.get(plan_tier)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        plan = db.query(Plan).filter(Plan.tier == plan_tier).first()
+        if not plan:
+            # Fallback to free if not found
+            plan = db.query(Plan).filter(Plan.tier == 'free').first()
+            if not plan:
+                return None
+
+        snapshot = {
+            'name': plan.name,
+            'price_monthly': float(plan.price_monthly),
+            'price_yearly': float(plan.price_yearly),
+            'limits': plan.limits,
+            'features': plan.features,
+        }
+        cls._cache[plan_tier] = (now + PLAN_CACHE_TTL_SECONDS, snapshot)
+        return snapshot
+
+    @classmethod
+    def invalidate_cache(cls):
+        """Drop cached plans (call after writing to the plans table)"""
+        cls._cache.clear()
+
     @classmethod
     def get_plan(cls, db: Session, plan_tier: str, user: User = None) -> dict:
         """
-        Get plan configuration from database.
+        Get plan configuration (cached in-process for PLAN_CACHE_TTL_SECONDS).
         If user is provided and is a tester, returns pro-level limits regardless of plan_tier.
         """
         # Testers get pro-level access
         if user and user.is_tester:
             plan_tier = 'pro'
         
-        plan = db.query(Plan).filter(Plan.tier == plan_tier.lower()).first()
+        plan = cls._load_plan(db, plan_tier)
         if not plan:
-            # Fallback to free if not found
-            plan = db.query(Plan).filter(Plan.tier == 'free').first()
-            if not plan:
-                raise ValueError(f"Plan not found: {plan_tier}")
+            raise ValueError(f"Plan not found: {plan_tier}")
 
-        limits = plan.limits
+        limits = plan['limits']
         return {
-            'name': plan.name,
-            'price_monthly': float(plan.price_monthly),
-            'price_yearly': float(plan.price_yearly),
+            'name': plan['name'],
+            'price_monthly': plan['price_monthly'],
+            'price_yearly': plan['price_yearly'],
             'toggles_per_day': limits.get('toggles_per_day', 0),
             'refreshes_per_day': limits.get('refreshes_per_day', 5),
             'error_views_per_day': limits.get('error_views_per_day', 3),
@@ -73,20 +109,17 @@ class PlanConfiguration:
             'max_instances': limits.get('max_instances', 1),
             'push_notifications': limits.get('push_notifications', False),
             'cache_ttl_minutes': limits.get('cache_ttl_minutes', 10),
-            'features': plan.features
+            'features': list(plan['features'])
         }
 
     @classmethod
     def get_limit(cls, db: Session, plan_tier: str, limit_type: str) -> int:
-        """Get specific limit for a plan from database (-1 = unlimited)"""
-        plan = db.query(Plan).filter(Plan.tier == plan_tier.lower()).first()
+        """Get specific limit for a plan (-1 = unlimited)"""
+        plan = cls._load_plan(db, plan_tier)
         if not plan:
-            # Fallback to free if not found
-            plan = db.query(Plan).filter(Plan.tier == 'free').first()
-            if not plan:
-                return 0
+            return 0
 
-        limits = plan.limits
+        limits = plan['limits']
         # Map limit_type to limits dict key
         limit_map = {
             'toggles_per_day': 'toggles_per_day',
@@ -204,6 +237,7 @@ class SubscriptionService:
                 db.add(pro_plan)
 
                 db.commit()
+                PlanConfiguration.invalidate_cache()
                 self.logger.info(
                     "_seed_plans_if_empty: Success - seeded free and pro plans")
         except Exception as e:
@@ -337,17 +371,16 @@ class SubscriptionService:
 
             # Create history entry
             history = SubscriptionHistory(
-                id=str(uuid.uuid4()),
                 user_id=user_id,
                 subscription_id=subscription.id,
-                action='created' if old_plan == 'free' else 'upgraded',
+                action=HistoryAction.CREATED if old_plan == 'free' else HistoryAction.UPGRADED,
                 from_plan=old_plan,
                 to_plan=plan_tier,
-                details=json.dumps({
+                details={
                     'platform': platform,
                     'billing_period': billing_period,
                     'purchase_token': purchase_token[:20] + '...' if purchase_token else None
-                })
+                }
             )
             db.add(history)
 
@@ -402,16 +435,15 @@ class SubscriptionService:
 
             # Create history entry
             history = SubscriptionHistory(
-                id=str(uuid.uuid4()),
                 user_id=user_id,
                 subscription_id=subscription.id,
-                action='cancelled',
+                action=HistoryAction.CANCELLED,
                 from_plan=subscription.plan_tier,
                 to_plan='free',  # Will revert to free after end_date
-                details=json.dumps({
+                details={
                     'cancelled_at': datetime.utcnow().isoformat(),
                     'end_date': subscription.end_date.isoformat() if subscription.end_date else None
-                })
+                }
             )
             db.add(history)
 
@@ -451,12 +483,12 @@ class SubscriptionService:
             result = []
             for entry in history:
                 result.append({
-                    'id': entry.id,
-                    'action': entry.action,
+                    'id': str(entry.id),
+                    'action': entry.action.value,
                     'from_plan': entry.from_plan,
                     'to_plan': entry.to_plan,
                     'created_at': entry.created_at.isoformat(),
-                    'details': json.loads(entry.details) if entry.details else None
+                    'details': entry.details
                 })
 
             self.analytics.log_success(
@@ -503,16 +535,15 @@ class SubscriptionService:
 
                 # Create history entry
                 history = SubscriptionHistory(
-                    id=str(uuid.uuid4()),
                     user_id=subscription.user_id,
                     subscription_id=subscription.id,
-                    action='expired',
+                    action=HistoryAction.EXPIRED,
                     from_plan=subscription.plan_tier,
                     to_plan='free',
-                    details=json.dumps({
+                    details={
                         'expired_at': now.isoformat(),
                         'end_date': subscription.end_date.isoformat()
-                    })
+                    }
                 )
                 db.add(history)
                 count += 1
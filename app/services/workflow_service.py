@@ -1,6 +1,5 @@
 import json
 import logging
-import uuid
 
 import httpx
 from sqlalchemy.orm import Session
@@ -55,7 +54,7 @@ class WorkflowService:
 
             # Get instance and verify ownership
             instance = self.instance_service.get_instance(
-                db, instance_id, user_id)
+                db, instance_id, user_id, with_api_key=True)
 
             # Check if instance is enabled before fetching workflows
             if not instance.enabled:
@@ -181,7 +180,7 @@ class WorkflowService:
 
             # Get instance and verify ownership
             instance = self.instance_service.get_instance(
-                db, instance_id, user_id)
+                db, instance_id, user_id, with_api_key=True)
 
             # Check if instance is enabled before toggling workflows
             if not instance.enabled:
@@ -225,7 +224,6 @@ class WorkflowService:
 
             # Create audit log
             audit_log = AuditLog(
-                id=str(uuid.uuid4()),
                 user_id=user_id,
                 action='toggle_workflow',
                 resource_type='workflow',
@@ -328,7 +326,7 @@ class WorkflowService:
 
             # Get instance and verify ownership
             instance = self.instance_service.get_instance(
-                db, instance_id, user_id)
+                db, instance_id, user_id, with_api_key=True)
 
             # Check if instance is enabled before fetching executions
             if not instance.enabled:
@@ -474,7 +472,7 @@ class WorkflowService:
 
             # Get instance and verify ownership
             instance = self.instance_service.get_instance(
-                db, instance_id, user_id)
+                db, instance_id, user_id, with_api_key=True)
 
             # Check if instance is enabled before fetching execution
             if not instance.enabled:
@@ -575,7 +573,7 @@ class WorkflowService:
         try:
             # Get instance and verify ownership
             instance = self.instance_service.get_instance(
-                db, instance_id, user_id)
+                db, instance_id, user_id, with_api_key=True)
 
             # Check if instance is enabled before retrying execution
             if not instance.enabled:
@@ -716,7 +714,6 @@ class WorkflowService:
 
             # Create audit log
             audit_log = AuditLog(
-                id=str(uuid.uuid4()),
                 user_id=user_id,
                 action='retry_execution',
                 resource_type='execution',
@@ -0,0 +1,113 @@
+"""
+Tests for analytics service - background Firestore writes
+"""
+
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+from app.services.analytics_service import AnalyticsService, AnalyticsWorker
+
+
+class TestAnalyticsWorker:
+    """Test cases for the background analytics writer"""
+
+    @patch("app.services.analytics_service.get_firestore_client")
+    def test_queued_documents_are_written(self, mock_get_client):
+        """Enqueued documents are added to their collections by the worker"""
+        db = MagicMock()
+        mock_get_client.return_value = db
+        worker = AnalyticsWorker()
+
+        assert worker.enqueue("analytics_events", {"event_name": "a"})
+        assert worker.enqueue("crashlytics_errors", {"action": "b"})
+        worker.flush()
+
+        db.collection.assert_any_call("analytics_events")
+        db.collection.assert_any_call("crashlytics_errors")
+        assert db.batch.return_value.set.call_count == 2
+
+    @patch("app.services.analytics_service.get_firestore_client")
+    def test_collection_references_are_reused(self, mock_get_client):
+        """Each collection reference is built once and reused for later writes"""
+        db = MagicMock()
+        mock_get_client.return_value = db
+        worker = AnalyticsWorker()
+
+        worker.enqueue("analytics_events", {"n": 1})
+        worker.enqueue("analytics_events", {"n": 2})
+        worker.flush()
+
+        db.collection.assert_called_once_with("analytics_events")
+        assert db.batch.return_value.set.call_count == 2
+
+    def test_full_queue_drops_event(self):
+        """Events beyond the queue size are dropped instead of blocking"""
+        worker = AnalyticsWorker(maxsize=1)
+        worker.start = MagicMock()  # No writer thread, so the queue stays full
+        worker._thread = MagicMock()
+
+        assert worker.enqueue("analytics_events", {"n": 1})
+        assert not worker.enqueue("analytics_events", {"n": 2})
+
+    @patch("app.services.analytics_service.get_firestore_client")
+    def test_flush_gives_up_at_timeout(self, mock_get_client):
+        """A stuck Firestore write doesn't hold flush past its timeout"""
+        release = threading.Event()
+        mock_get_client.return_value.collection.return_value.document.return_value.set.side_effect = (
+            lambda data: release.wait(5)
+        )
+        worker = AnalyticsWorker()
+        worker.enqueue("analytics_events", {"n": 1})
+
+        started = time.monotonic()
+        try:
+            assert worker.flush(timeout=0.1) is False
+            assert time.monotonic() - started < 1
+        finally:
+            release.set()
+
+        assert worker.flush() is True
+
+    @patch("app.services.analytics_service.get_firestore_client")
+    def test_grouped_documents_are_committed_in_one_batch(self, mock_get_client):
+        """Documents enqueued together are written with a single batch commit"""
+        db = MagicMock()
+        mock_get_client.return_value = db
+        worker = AnalyticsWorker()
+
+        worker.enqueue("analytics_events", {"event_name": "a"}, ("crashlytics_errors", {"action": "b"}))
+        worker.flush()
+
+        batch = db.batch.return_value
+        assert batch.set.call_count == 2
+        batch.commit.assert_called_once()
+        db.collection.return_value.document.return_value.set.assert_not_called()
+
+    @patch("app.services.analytics_service.ANALYTICS_BATCH_MAX_WRITES", 2)
+    @patch("app.services.analytics_service.get_firestore_client")
+    def test_separate_events_are_batched_up_to_limit(self, mock_get_client):
+        """Events queued close together share a commit until the batch is full"""
+        db = MagicMock()
+        mock_get_client.return_value = db
+        worker = AnalyticsWorker()
+
+        for n in range(3):
+            worker.enqueue("analytics_events", {"n": n})
+        worker.flush()
+
+        db.batch.return_value.commit.assert_called_once()
+        assert db.batch.return_value.set.call_count == 2
+        db.collection.return_value.document.return_value.set.assert_called_once_with({"n": 2})
+
+    @patch("app.services.analytics_service.analytics_worker")
+    def test_log_failure_enqueues_event_and_error_together(self, mock_worker):
+        """log_failure queues the analytics event and error record as one batch"""
+        AnalyticsService().log_failure(action="webhook_n8n_error", error="boom", user_id="u1")
+
+        mock_worker.enqueue.assert_called_once()
+        args = mock_worker.enqueue.call_args.args
+        assert args[0] == "analytics_events"
+        assert args[1]["event_name"] == "webhook_n8n_error_failure"
+        assert args[2][0] == "crashlytics_errors"
+        assert args[2][1]["error_message"] == "boom"
@@ -0,0 +1,192 @@
+"""
+Tests for device service - registration, listing and stale token cleanup
+"""
+
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from google.api_core.exceptions import FailedPrecondition
+
+from app.services import device_service
+from app.services.device_service import DeviceService
+
+
+def make_device_doc(device_id: str, last_used_at: datetime):
+    """Create a mock device snapshot"""
+    doc = MagicMock()
+    doc.id = device_id
+    doc.get.side_effect = {"last_used_at": last_used_at}.__getitem__
+    return doc
+
+
+@pytest.fixture
+def mock_db():
+    """Create a mock Firestore client"""
+    return MagicMock()
+
+
+@pytest.fixture
+def mock_async_db():
+    """Create a mock async Firestore client"""
+    return MagicMock()
+
+
+@pytest.fixture
+def service(mock_db, mock_async_db):
+    """Create a DeviceService backed by the mock Firestore clients"""
+    with patch("app.services.device_service.get_firestore_client", return_value=mock_db), \
+            patch("app.services.device_service.get_async_firestore_client", return_value=mock_async_db):
+        return DeviceService()
+
+
+@pytest.fixture
+def stale_device_query(mock_db):
+    """The collection-group query for stale devices"""
+    return mock_db.collection_group.return_value.where.return_value.order_by.return_value.select.return_value.limit.return_value
+
+
+class TestCleanupStaleTokens:
+    """Test cases for removing devices that haven't been used recently"""
+
+    def test_stale_devices_found_with_collection_group_query(self, service, mock_db, stale_device_query):
+        """Stale devices come from one filtered, keys-only collection-group query"""
+        stale_device_query.stream.return_value = [MagicMock(), MagicMock()]
+
+        deleted = service.cleanup_stale_tokens(days=30)
+
+        assert deleted == 2
+        mock_db.collection_group.assert_called_once_with("devices")
+        mock_db.collection_group.return_value.where.return_value.order_by.return_value.select.assert_called_once_with([])
+        mock_db.collection.assert_not_called()
+        assert mock_db.batch.return_value.delete.call_count == 2
+
+    def test_stale_devices_deleted_page_by_page(self, service, mock_db, stale_device_query, monkeypatch):
+        """The query is re-run for another page until a page comes back short"""
+        monkeypatch.setattr(device_service, "CLEANUP_PAGE_SIZE", 2)
+        stale_device_query.stream.side_effect = [[MagicMock(), MagicMock()], [MagicMock()]]
+
+        deleted = service.cleanup_stale_tokens(days=30)
+
+        assert deleted == 3
+        assert stale_device_query.stream.call_count == 2
+        mock_db.collection_group.return_value.where.return_value.order_by.return_value.select.return_value.limit.assert_called_once_with(2)
+        assert mock_db.batch.return_value.commit.call_count == 2
+
+
+class TestCleanupStaleTokensWithoutIndex:
+    """Test cases for the full scan used when the collection-group index is missing"""
+
+    @pytest.fixture(autouse=True)
+    def no_index(self, stale_device_query):
+        """Make the collection-group query fail as it does without an index"""
+        stale_device_query.stream.side_effect = FailedPrecondition("index required")
+
+    def test_stale_devices_deleted_in_batches(self, service, mock_db, monkeypatch):
+        """Stale devices are deleted through batches committed at the size limit"""
+        monkeypatch.setattr(device_service, "FIRESTORE_BATCH_LIMIT", 3)
+        old = datetime.now(timezone.utc) - timedelta(days=60)
+        fresh = datetime.now(timezone.utc)
+        user_doc = MagicMock(id="user_1")
+        device_docs = [
+            make_device_doc("a", old),
+            make_device_doc("b", fresh),
+            make_device_doc("c", old),
+            make_device_doc("d", old),
+        ]
+        for doc in device_docs:
+            doc.reference.id = doc.id
+            doc.reference.parent.parent = user_doc.reference
+        user_doc.reference.collection.return_value.select.return_value.stream.return_value = device_docs
+        mock_db.collection.return_value.stream.return_value = [user_doc]
+
+        deleted = service.cleanup_stale_tokens(days=30)
+
+        assert deleted == 3
+        batch = mock_db.batch.return_value
+        assert batch.delete.call_count == 3
+        # Two deletes plus the user's token map update fill a batch, then the final partial batch
+        assert batch.commit.call_count == 2
+        assert list(batch.set.call_args_list[0].args[1]["device_tokens"]) == ["a", "c"]
+
+    def test_counts_are_summed_across_users(self, service, mock_db):
+        """Each user is cleaned up independently and the counts are added up"""
+        old = datetime.now(timezone.utc) - timedelta(days=60)
+        users = []
+        for user_id in ("user_1", "user_2", "user_3"):
+            user_doc = MagicMock(id=user_id)
+            user_doc.reference.collection.return_value.select.return_value.stream.return_value = [
+                make_device_doc(f"{user_id}_device", old),
+            ]
+            users.append(user_doc)
+        mock_db.collection.return_value.stream.return_value = users
+
+        assert service.cleanup_stale_tokens(days=30) == 3
+        assert mock_db.batch.return_value.commit.call_count == 3
+
+
+class TestGetUserDevices:
+    """Test cases for listing a user's devices"""
+
+    @pytest.mark.asyncio
+    async def test_requested_fields_are_projected(self, service, mock_async_db):
+        """Only the requested fields are fetched, and each device carries its id"""
+        doc = MagicMock(id="device_1")
+        doc.to_dict.return_value = {"fcm_token": "token_1"}
+
+        async def stream():
+            yield doc
+
+        devices_ref = mock_async_db.collection.return_value.document.return_value.collection.return_value
+        devices_ref.select.return_value.stream = stream
+
+        devices = await service.get_user_devices("user_1", fields=["fcm_token"])
+
+        devices_ref.select.assert_called_once_with(["fcm_token"])
+        assert devices == [{"fcm_token": "token_1", "id": "device_1"}]
+
+
+class TestRegisterDevice:
+    """Test cases for device registration"""
+
+    @pytest.fixture
+    def user_ref(self, mock_async_db):
+        """The user document reference, with registration's flag read mocked"""
+        user_ref = mock_async_db.collection.return_value.document.return_value
+        user_ref.get = AsyncMock(return_value=MagicMock(exists=True))
+        mock_async_db.batch.return_value.commit = AsyncMock()
+        return user_ref
+
+    @pytest.mark.asyncio
+    async def test_registration_is_a_single_write_batch(self, service, mock_async_db, user_ref):
+        """With a complete token map, user and device documents are merged in one commit"""
+        user_ref.get.return_value.to_dict.return_value = {"device_tokens_complete": True}
+        batch = mock_async_db.batch.return_value
+
+        await service.register_device("user_1", "device_1", "token_1", "ios")
+
+        assert batch.set.call_count == 2
+        assert all(call.kwargs == {"merge": True} for call in batch.set.call_args_list)
+        assert batch.set.call_args_list[1].args[1]["fcm_token"] == "token_1"
+        assert batch.set.call_args_list[0].args[1]["device_tokens"] == {"device_1": "token_1"}
+        batch.commit.assert_awaited_once()
+        user_ref.get.assert_awaited_once_with(field_paths=["device_tokens_complete"])
+        user_ref.collection.return_value.select.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_first_registration_copies_existing_devices_into_map(self, service, mock_async_db, user_ref):
+        """Devices registered before the token map existed are added to it and the map marked complete"""
+        user_ref.get.return_value.to_dict.return_value = {"device_tokens": {"device_1": "old"}}
+        existing = MagicMock(id="device_2")
+        existing.to_dict.return_value = {"fcm_token": "token_2"}
+
+        async def stream():
+            yield existing
+
+        user_ref.collection.return_value.select.return_value.stream = stream
+
+        await service.register_device("user_1", "device_1", "token_1", "ios")
+
+        user_data = mock_async_db.batch.return_value.set.call_args_list[0].args[1]
+        assert user_data["device_tokens"] == {"device_1": "token_1", "device_2": "token_2"}
+        assert user_data["device_tokens_complete"] is True
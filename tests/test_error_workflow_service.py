@@ -0,0 +1,214 @@
+"""
+Tests for error workflow service - n8n workflow template generation and sync
+"""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+
+from app.services.error_workflow_service import (
+    N8N_RETRY_BUDGET_SECONDS,
+    ErrorWorkflowService,
+    _build_workflow_template,
+    _with_retry,
+)
+
+
+@pytest.fixture
+def service():
+    """Create an ErrorWorkflowService with mocked analytics"""
+    with patch("app.services.error_workflow_service.AnalyticsService"):
+        return ErrorWorkflowService()
+
+
+@pytest.fixture
+def mock_db():
+    """Create a mock session that finds one instance"""
+    instance = MagicMock()
+    instance.name = "Prod"
+    db = MagicMock()
+    db.query.return_value.filter.return_value.first.return_value = instance
+    return db
+
+
+class TestCreateErrorWorkflowTemplate:
+    """Test cases for the cached workflow template"""
+
+    @pytest.fixture(autouse=True)
+    def clear_template_cache(self):
+        """Start every test with an empty template cache"""
+        _build_workflow_template.cache_clear()
+        yield
+        _build_workflow_template.cache_clear()
+
+    def test_template_embeds_instance_and_webhook(self, service, mock_db):
+        """The workflow is named after the instance and posts back its id"""
+        workflow = service.create_error_workflow_template(mock_db, "inst_1", "user_1")
+
+        assert workflow["name"] == "FlowDash Error Notifications - Prod"
+        assert workflow["meta"]["instanceId"] == "inst_1"
+        http_node = workflow["nodes"][1]
+        assert http_node["parameters"]["url"] == service.get_base_webhook_url()
+        assert '"instanceId": "inst_1"' in http_node["parameters"]["jsonBody"]
+
+    def test_template_built_once_and_callers_get_copies(self, service, mock_db):
+        """Repeated requests reuse the cached JSON without sharing mutable dicts"""
+        first = service.create_error_workflow_template(mock_db, "inst_1", "user_1")
+        first["name"] = "changed"
+        second = service.create_error_workflow_template(mock_db, "inst_1", "user_1")
+
+        assert second["name"] == "FlowDash Error Notifications - Prod"
+        assert _build_workflow_template.cache_info().hits == 1
+
+
+
+class TestValidateWorkflowConfig:
+    """Test cases for error workflow validation"""
+
+    def test_generated_template_is_valid(self, service, mock_db):
+        """The workflow FlowDash generates passes its own validation"""
+        workflow = service.create_error_workflow_template(mock_db, "inst_1", "user_1")
+
+        assert service.validate_workflow_config(workflow) is True
+
+    def test_instance_id_must_be_a_body_field(self, service, mock_db):
+        """Mentioning instanceId outside a JSON key does not count"""
+        workflow = service.create_error_workflow_template(mock_db, "inst_1", "user_1")
+        workflow["nodes"][1]["parameters"]["jsonBody"] = '={ "note": "instanceId missing" }'
+
+        assert service.validate_workflow_config(workflow) is False
+
+class TestCreateWorkflowInN8N:
+    """Test cases for syncing the error workflow to n8n"""
+
+    @pytest.fixture
+    def sync_instance(self):
+        """Create an instance with no saved error workflow"""
+        instance = MagicMock(url="https://n8n.example.com", api_key_encrypted="enc", n8n_error_workflow_id=None)
+        instance.name = "Prod"
+        return instance
+
+    @pytest.fixture
+    def sync_db(self, sync_instance):
+        """Create a mock session returning the instance and its Pro owner"""
+        db = MagicMock()
+        db.query.return_value.join.return_value.options.return_value.filter.return_value.first.return_value = (
+            sync_instance, "pro", False
+        )
+        return db
+
+    @pytest.mark.asyncio
+    @patch("app.services.error_workflow_service.decrypt_api_key", return_value="key")
+    @patch("app.services.error_workflow_service.PlanConfiguration.get_plan", return_value={"push_notifications": True})
+    async def test_deleted_workflow_is_recreated(self, mock_plan, mock_decrypt, service, sync_db):
+        """A 404 on update falls back to creating the workflow"""
+        client = MagicMock()
+        client.get = AsyncMock(return_value=MagicMock(
+            status_code=200,
+            content=b'{"data": [{"id": "old", "name": "FlowDash Error Notifications - Prod"}]}'
+        ))
+        client.put = AsyncMock(return_value=MagicMock(status_code=404))
+        client.post = AsyncMock(side_effect=[
+            MagicMock(status_code=200, content=b'{"data": {"id": "new"}}'),
+            MagicMock(status_code=200),
+        ])
+
+        with patch("app.services.error_workflow_service.get_n8n_client", return_value=client):
+            result = await service.create_workflow_in_n8n(sync_db, "inst_1", "user_1")
+
+        assert result["workflow_id"] == "new"
+        assert result["is_update"] is False
+        assert client.put.await_count == 1  # 4xx responses are not retried
+        assert client.get.await_args.kwargs["params"] == {"name": "FlowDash Error Notifications - Prod"}
+        assert client.post.await_args_list[1].args[0].endswith("/workflows/new/activate")
+        sync_db.commit.assert_called_once()
+
+    @pytest.mark.asyncio
+    @patch("app.services.error_workflow_service.asyncio.sleep", new_callable=AsyncMock)
+    @patch("app.services.error_workflow_service.decrypt_api_key", return_value="key")
+    @patch("app.services.error_workflow_service.PlanConfiguration.get_plan", return_value={"push_notifications": True})
+    async def test_transient_update_failure_is_retried(self, mock_plan, mock_decrypt, mock_sleep, service, sync_db):
+        """A 503 from n8n on update is retried after a backoff delay"""
+        client = MagicMock()
+        client.get = AsyncMock(return_value=MagicMock(
+            status_code=200,
+            content=b'{"data": [{"id": "old", "name": "FlowDash Error Notifications - Prod"}]}'
+        ))
+        client.put = AsyncMock(side_effect=[MagicMock(status_code=503), MagicMock(status_code=200)])
+        client.post = AsyncMock(return_value=MagicMock(status_code=200))
+
+        with patch("app.services.error_workflow_service.get_n8n_client", return_value=client):
+            result = await service.create_workflow_in_n8n(sync_db, "inst_1", "user_1")
+
+        assert result["workflow_id"] == "old"
+        assert result["is_update"] is True
+        assert client.put.await_count == 2
+        mock_sleep.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    @patch("app.services.error_workflow_service.decrypt_api_key", return_value="key")
+    @patch("app.services.error_workflow_service.PlanConfiguration.get_plan", return_value={"push_notifications": True})
+    async def test_saved_workflow_updated_without_lookup(self, mock_plan, mock_decrypt, service, sync_db, sync_instance):
+        """A workflow id saved by an earlier sync is updated directly"""
+        sync_instance.n8n_error_workflow_id = "saved"
+        client = MagicMock()
+        client.get = AsyncMock()
+        client.put = AsyncMock(return_value=MagicMock(status_code=200))
+        client.post = AsyncMock(return_value=MagicMock(status_code=200))
+
+        with patch("app.services.error_workflow_service.get_n8n_client", return_value=client):
+            result = await service.create_workflow_in_n8n(sync_db, "inst_1", "user_1")
+
+        assert result["workflow_id"] == "saved"
+        assert result["is_update"] is True
+        client.get.assert_not_awaited()
+        assert client.put.await_args.args[0].endswith("/workflows/saved")
+        sync_db.query.assert_called_once()  # The template reuses the loaded instance
+        sync_db.commit.assert_not_called()
+
+
+class TestWithRetry:
+    """Test cases for the n8n retry budget"""
+
+    @pytest.mark.asyncio
+    @patch("app.services.error_workflow_service.asyncio.sleep", new_callable=AsyncMock)
+    async def test_attempt_past_budget_is_not_retried(self, mock_sleep, monkeypatch):
+        """A failed attempt that used up the budget is raised instead of retried"""
+        clock = [100.0]
+        monkeypatch.setattr("app.services.error_workflow_service.time.monotonic", lambda: clock[0])
+
+        async def timed_out_send(url, timeout):
+            clock[0] += N8N_RETRY_BUDGET_SECONDS + 1
+            raise httpx.ReadTimeout("timed out")
+
+        send = AsyncMock(side_effect=timed_out_send)
+
+        with pytest.raises(httpx.ReadTimeout):
+            await _with_retry(send, "https://n8n.example.com/api/v1/workflows")
+
+        send.assert_awaited_once()
+        assert send.await_args.kwargs["timeout"] == N8N_RETRY_BUDGET_SECONDS
+        mock_sleep.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    @patch("app.services.error_workflow_service.asyncio.sleep", new_callable=AsyncMock)
+    async def test_retry_gets_remaining_budget_as_timeout(self, mock_sleep, monkeypatch):
+        """Later attempts are capped at the time left in the budget"""
+        clock = [100.0]
+        monkeypatch.setattr("app.services.error_workflow_service.time.monotonic", lambda: clock[0])
+        responses = iter([MagicMock(status_code=503), MagicMock(status_code=200)])
+
+        async def slow_send(url, timeout):
+            clock[0] += 10
+            return next(responses)
+
+        send = AsyncMock(side_effect=slow_send)
+
+        response = await _with_retry(send, "https://n8n.example.com/api/v1/workflows")
+
+        assert response.status_code == 200
+        assert [call.kwargs["timeout"] for call in send.await_args_list] == [
+            N8N_RETRY_BUDGET_SECONDS,
+            N8N_RETRY_BUDGET_SECONDS - 10,
+        ]
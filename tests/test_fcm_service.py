@@ -0,0 +1,201 @@
+"""
+Tests for FCM service - notification message assembly
+"""
+
+import json
+
+import httpx
+import pytest
+from unittest.mock import MagicMock, patch, AsyncMock
+
+from app.models.fcm_notification import DEFAULT_ANDROID_CONFIG, DEFAULT_APNS_CONFIG, FCMMessage
+from app.notifier.webhook_handler import Severity
+from app.services.fcm_service import FCM_ERROR_MESSAGE_MAX_LENGTH, FCMService
+
+
+@pytest.fixture
+def fcm_service():
+    """Create an FCMService with a mocked Firestore client"""
+    with patch("app.services.fcm_service.get_firestore_client"):
+        service = FCMService()
+    service.get_user_device_tokens = MagicMock(return_value=[
+        {"token": "token_a", "device_id": "device_a"},
+        {"token": "token_b", "device_id": "device_b"},
+    ])
+    return service
+
+
+class TestSendErrorNotification:
+    """Test cases for the FCM HTTP v1 request body"""
+
+    @pytest.mark.asyncio
+    @patch("app.services.fcm_service.get_fcm_access_token", return_value="access")
+    async def test_sends_data_only_message_per_device(self, mock_token, fcm_service):
+        """Each device gets a data-only message with string data values"""
+        client = MagicMock()
+        client.post = AsyncMock(return_value=MagicMock(status_code=200))
+
+        with patch("app.services.fcm_service.get_fcm_client", return_value=client):
+            await fcm_service.send_error_notification(
+                user_id="user_1",
+                workflow_id="wf_1",
+                execution_id="exec_1",
+                instance_id="inst_1",
+                error_message="boom",
+                severity="critical",
+            )
+
+        assert client.post.await_count == 2
+        bodies = [json.loads(call.kwargs["content"]) for call in client.post.await_args_list]
+        assert [b["message"]["token"] for b in bodies] == ["token_a", "token_b"]
+
+        message = bodies[0]["message"]
+        assert "notification" not in message
+        assert message["data"]["severity"] == "critical"
+        assert message["data"]["title"] == "🚨 Critical Workflow Error"
+        assert "workflow_name" not in message["data"]
+        assert message["android"] == {"priority": "high"}
+        assert message["apns"]["payload"]["aps"]["content-available"] == 1
+
+    @pytest.mark.asyncio
+    @patch("app.services.fcm_service.get_fcm_access_token", return_value="access")
+    async def test_duplicate_tokens_sent_once_and_rejected_tokens_removed(self, mock_token, fcm_service):
+        """Devices sharing a token get one message; a 404 removes the stale device"""
+        fcm_service.get_user_device_tokens.return_value = [
+            {"token": "token_a", "device_id": "device_a"},
+            {"token": "token_a", "device_id": "device_a2"},
+            {"token": "token_b", "device_id": "device_b"},
+        ]
+        fcm_service.remove_invalid_device_tokens = MagicMock()
+        rejected = MagicMock()
+        rejected.raise_for_status.side_effect = httpx.HTTPStatusError(
+            "not found", request=MagicMock(), response=MagicMock(status_code=404)
+        )
+        client = MagicMock()
+        client.post = AsyncMock(side_effect=[MagicMock(status_code=200), rejected])
+
+        with patch("app.services.fcm_service.get_fcm_client", return_value=client):
+            await fcm_service.send_error_notification(
+                user_id="user_1",
+                workflow_id="wf_1",
+                execution_id="exec_1",
+                instance_id="inst_1",
+                error_message="boom",
+            )
+
+        assert client.post.await_count == 2
+        fcm_service.remove_invalid_device_tokens.assert_called_once_with("user_1", ["device_b"])
+
+
+    @pytest.mark.asyncio
+    @patch("app.services.fcm_service.get_fcm_access_token", return_value="access")
+    async def test_long_error_message_is_capped(self, mock_token, fcm_service):
+        """Oversized error messages are cut before being sent to each device"""
+        client = MagicMock()
+        client.post = AsyncMock(return_value=MagicMock(status_code=200))
+
+        with patch("app.services.fcm_service.get_fcm_client", return_value=client):
+            await fcm_service.send_error_notification(
+                user_id="user_1",
+                workflow_id="wf_1",
+                execution_id="exec_1",
+                instance_id="inst_1",
+                error_message="x" * 10000,
+            )
+
+        for call in client.post.await_args_list:
+            data = json.loads(call.kwargs["content"])["message"]["data"]
+            assert len(data["error_message"]) == FCM_ERROR_MESSAGE_MAX_LENGTH
+
+    @pytest.mark.asyncio
+    @patch("app.services.fcm_service.get_fcm_access_token", return_value="access")
+    async def test_severity_enum_sent_as_its_value(self, mock_token, fcm_service):
+        """The webhook's Severity enum reaches devices as its plain string value"""
+        client = MagicMock()
+        client.post = AsyncMock(return_value=MagicMock(status_code=200))
+
+        with patch("app.services.fcm_service.get_fcm_client", return_value=client):
+            await fcm_service.send_error_notification(
+                user_id="user_1",
+                workflow_id="wf_1",
+                execution_id="exec_1",
+                instance_id="inst_1",
+                error_message="boom",
+                severity=Severity.WARNING,
+            )
+
+        data = json.loads(client.post.await_args.kwargs["content"])["message"]["data"]
+        assert data["severity"] == "warning"
+        assert data["title"] == "⚠️ Workflow Warning"
+
+
+class TestRemoveInvalidDeviceTokens:
+    """Test cases for deleting rejected device tokens"""
+
+    def test_tokens_deleted_in_batches(self, fcm_service, monkeypatch):
+        """Rejected devices and their token map entries are removed one batch per size limit"""
+        monkeypatch.setattr("app.services.fcm_service.FIRESTORE_BATCH_LIMIT", 3)
+
+        fcm_service.remove_invalid_device_tokens("user_1", ["a", "b", "c"])
+
+        batch = fcm_service.db.batch.return_value
+        assert batch.delete.call_count == 3
+        # Two devices plus the user's map update fill the first batch
+        assert batch.commit.call_count == 2
+        assert list(batch.set.call_args_list[0].args[1]["device_tokens"]) == ["a", "b"]
+
+class TestFCMMessageDefaults:
+    """Test cases for shared platform config defaults"""
+
+    def test_default_platform_configs_are_shared(self):
+        """Messages without explicit configs reuse the frozen module defaults"""
+        first = FCMMessage(token="a", data={})
+        second = FCMMessage(token="b", data={})
+
+        assert first.android is DEFAULT_ANDROID_CONFIG
+        assert second.apns is first.apns is DEFAULT_APNS_CONFIG
+
+
+class TestGetUserDeviceTokens:
+    """Test cases for reading a user's device tokens"""
+
+    @pytest.fixture
+    def service_and_user_ref(self):
+        """Create an FCMService and the mock user document reference it reads"""
+        with patch("app.services.fcm_service.get_firestore_client") as mock_get_client:
+            service = FCMService()
+        return service, mock_get_client.return_value.collection.return_value.document.return_value
+
+    def test_tokens_read_from_complete_token_map(self, service_and_user_ref):
+        """One read of a complete token map lists every device"""
+        service, user_ref = service_and_user_ref
+        user_ref.get.return_value = MagicMock(exists=True)
+        user_ref.get.return_value.to_dict.return_value = {
+            "device_tokens": {"device_a": "token_a"},
+            "device_tokens_complete": True,
+        }
+
+        tokens = service.get_user_device_tokens("user_1")
+
+        assert tokens == [{"token": "token_a", "device_id": "device_a"}]
+        user_ref.get.assert_called_once_with(field_paths=["device_tokens", "device_tokens_complete"])
+        user_ref.collection.assert_not_called()
+
+    def test_incomplete_token_map_falls_back_to_devices(self, service_and_user_ref):
+        """A device missing from a partial map is still found in the devices subcollection"""
+        service, user_ref = service_and_user_ref
+        user_ref.get.return_value = MagicMock(exists=True)
+        user_ref.get.return_value.to_dict.return_value = {"device_tokens": {"device_a": "token_a"}}
+        device_docs = []
+        for device_id, token in (("device_a", "token_a"), ("device_b", "token_b")):
+            doc = MagicMock(id=device_id)
+            doc.get.side_effect = {"fcm_token": token}.__getitem__
+            device_docs.append(doc)
+        user_ref.collection.return_value.select.return_value.stream.return_value = device_docs
+
+        tokens = service.get_user_device_tokens("user_1")
+
+        assert tokens == [
+            {"token": "token_a", "device_id": "device_a"},
+            {"token": "token_b", "device_id": "device_b"},
+        ]
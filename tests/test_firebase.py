@@ -0,0 +1,38 @@
+"""
+Tests for Firebase helpers - FCM access token reuse
+"""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.core import firebase
+
+
+@pytest.fixture(autouse=True)
+def reset_fcm_credentials():
+    """Start every test without cached FCM credentials"""
+    firebase._fcm_credentials = None
+    yield
+    firebase._fcm_credentials = None
+
+
+class TestGetFCMAccessToken:
+    """Test cases for reusing the FCM OAuth2 token"""
+
+    @patch("app.core.firebase.service_account.Credentials.from_service_account_file")
+    def test_token_refreshed_only_when_invalid(self, mock_from_file):
+        """Credentials are loaded once and refreshed only after their token expires"""
+        creds = MagicMock(valid=False, token="token_1")
+        creds.refresh.side_effect = lambda request: setattr(creds, "valid", True)
+        mock_from_file.return_value = creds
+
+        assert firebase.get_fcm_access_token() == "token_1"
+        assert firebase.get_fcm_access_token() == "token_1"
+        assert creds.refresh.call_count == 1
+
+        creds.valid = False
+        firebase.get_fcm_access_token()
+
+        assert creds.refresh.call_count == 2
+        mock_from_file.assert_called_once()
@@ -0,0 +1,69 @@
+"""
+Tests for instance routes - response shape
+"""
+
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.routes.instances import router
+from app.core.database import get_db
+from app.core.middleware import get_current_user
+from app.models.n8n_instance import N8NInstance
+
+INSTANCE_FIELDS = {"id", "user_id", "name", "url", "enabled", "created_at", "updated_at"}
+
+
+@pytest.fixture
+def client():
+    """Create a test client for the instance routes with auth and database overridden"""
+    app = FastAPI()
+    app.include_router(router, prefix="/instances")
+    app.dependency_overrides[get_current_user] = lambda: {"uid": "user_1"}
+    app.dependency_overrides[get_db] = lambda: MagicMock()
+    return TestClient(app)
+
+
+@pytest.fixture
+def instance():
+    """Create a loaded instance, including the encrypted API key"""
+    return N8NInstance(
+        id="instance_1",
+        user_id="user_1",
+        name="Prod",
+        url="https://n8n.example.com",
+        api_key_encrypted="ciphertext",
+        enabled=True,
+        n8n_error_workflow_id="wf_1",
+        created_at=datetime(2026, 1, 1),
+        updated_at=datetime(2026, 1, 2),
+    )
+
+
+class TestInstanceResponses:
+    """Test cases for the instance response schema"""
+
+    @patch("app.api.v1.routes.instances.InstanceService")
+    def test_list_returns_schema_fields_only(self, mock_service, client, instance):
+        """Listed instances expose the schema fields, never the encrypted key"""
+        mock_service.return_value.list_instances.return_value = [instance]
+
+        response = client.get("/instances")
+
+        assert response.status_code == 200
+        body = response.json()["instances"]
+        assert set(body[0]) == INSTANCE_FIELDS
+        assert body[0]["name"] == "Prod"
+
+    @patch("app.api.v1.routes.instances.InstanceService")
+    def test_get_returns_schema_fields_only(self, mock_service, client, instance):
+        """A single instance has the same shape whatever columns were loaded"""
+        mock_service.return_value.get_instance.return_value = instance
+
+        response = client.get("/instances/instance_1")
+
+        assert response.status_code == 200
+        assert set(response.json()) == INSTANCE_FIELDS
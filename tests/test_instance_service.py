@@ -0,0 +1,151 @@
+"""
+Tests for instance service - webhook instance lookups
+"""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.models.n8n_instance import N8NInstance
+from app.models.user import User
+from app.services.instance_service import InstanceService
+
+
+@pytest.fixture(autouse=True)
+def clear_webhook_cache():
+    """Start every test with an empty webhook instance cache"""
+    InstanceService._webhook_cache.clear()
+    yield
+    InstanceService._webhook_cache.clear()
+
+
+@pytest.fixture
+def instance_service():
+    """Create an InstanceService with analytics mocked out"""
+    with patch("app.services.instance_service.AnalyticsService"):
+        return InstanceService()
+
+
+@pytest.fixture
+def mock_loaded_instance():
+    """Create a mock instance loaded together with its owner"""
+    owner = MagicMock(spec=User)
+    owner.id = "user_1"
+    instance = MagicMock(spec=N8NInstance)
+    instance.id = "instance_1"
+    instance.user_id = "user_1"
+    instance.enabled = True
+    instance.user = owner
+    return instance
+
+
+class TestGetWebhookTarget:
+    """Test cases for the cached webhook instance lookup"""
+
+    def test_repeat_lookups_use_cached_instance(self, instance_service, mock_loaded_instance):
+        """A second webhook for the same instance only reloads the owner"""
+        db = MagicMock(spec=Session)
+        instance_service.get_instance_by_id = MagicMock(return_value=mock_loaded_instance)
+
+        first, first_user = instance_service.get_webhook_target(db, "instance_1")
+        second, _ = instance_service.get_webhook_target(db, "instance_1")
+
+        instance_service.get_instance_by_id.assert_called_once_with(db, "instance_1", with_user=True)
+        db.get.assert_called_once_with(User, "user_1")
+        assert first_user is mock_loaded_instance.user
+        assert first == second
+        assert second.enabled is True
+
+    def test_invalidate_forces_reload(self, instance_service, mock_loaded_instance):
+        """Invalidating an instance drops its cached fields"""
+        db = MagicMock(spec=Session)
+        instance_service.get_instance_by_id = MagicMock(return_value=mock_loaded_instance)
+
+        instance_service.get_webhook_target(db, "instance_1")
+        InstanceService.invalidate_webhook_cache("instance_1")
+        instance_service.get_webhook_target(db, "instance_1")
+
+        assert instance_service.get_instance_by_id.call_count == 2
+
+
+class TestGetInstance:
+    """Test cases for owner-scoped instance lookups"""
+
+    def test_other_users_instance_is_not_found(self, instance_service, mock_loaded_instance):
+        """An instance owned by someone else is reported as missing"""
+        db = MagicMock(spec=Session)
+        db.get.return_value = mock_loaded_instance
+
+        with pytest.raises(HTTPException) as exc_info:
+            instance_service.get_instance(db, "instance_1", "user_2")
+
+        assert exc_info.value.status_code == 404
+        db.get.assert_called_once_with(N8NInstance, "instance_1", options=None)
+
+class TestCreateInstance:
+    """Test cases for the instance limit check on create"""
+
+    @patch("app.services.instance_service.PlanConfiguration.get_plan", return_value={"name": "Free", "max_instances": 1})
+    def test_limit_checked_from_user_instance_count(self, mock_plan, instance_service):
+        """The plan limit is compared with the count kept on the user row"""
+        user = MagicMock(spec=User, is_tester=False, plan_tier="free", instance_count=1)
+        db = MagicMock(spec=Session)
+        db.get.return_value = user
+
+        with pytest.raises(HTTPException) as exc_info:
+            instance_service.create_instance(db, "user_1", "Prod", "https://n8n.example.com", "key")
+
+        assert exc_info.value.status_code == 403
+        db.get.assert_called_once_with(User, "user_1")
+        db.query.assert_not_called()
+        db.add.assert_not_called()
+
+    @patch("app.services.instance_service.get_cache")
+    @patch("app.services.instance_service.PlanConfiguration.get_plan", return_value={"name": "Free", "max_instances": 3})
+    def test_second_free_creation_today_is_rate_limited(self, mock_plan, mock_get_cache, instance_service):
+        """One atomic increment both checks and records the daily creation"""
+        mock_get_cache.return_value.incr_with_ttl.return_value = 2
+        user = MagicMock(spec=User, is_tester=False, plan_tier="free", instance_count=1)
+        db = MagicMock(spec=Session)
+        db.get.return_value = user
+
+        with pytest.raises(HTTPException) as exc_info:
+            instance_service.create_instance(db, "user_1", "Prod", "https://n8n.example.com", "key")
+
+        assert exc_info.value.status_code == 429
+        mock_get_cache.return_value.incr_with_ttl.assert_called_once()
+        mock_get_cache.return_value.get.assert_not_called()
+        mock_get_cache.return_value.incr.assert_not_called()
+
+    @patch("app.services.instance_service.encrypt_api_key", return_value="enc")
+    @patch("app.services.instance_service.get_cache")
+    @patch("app.services.instance_service.PlanConfiguration.get_plan", return_value={"name": "Free", "max_instances": 3})
+    def test_failed_creation_releases_daily_slot(self, mock_plan, mock_get_cache, mock_encrypt, instance_service):
+        """A creation that fails after being counted is taken back off the counter"""
+        mock_get_cache.return_value.incr_with_ttl.return_value = 1
+        user = MagicMock(spec=User, is_tester=False, plan_tier="free", instance_count=0)
+        db = MagicMock(spec=Session)
+        db.get.return_value = user
+        db.commit.side_effect = RuntimeError("db down")
+
+        with pytest.raises(RuntimeError):
+            instance_service.create_instance(db, "user_1", "Prod", "https://n8n.example.com", "key")
+
+        key = mock_get_cache.return_value.incr_with_ttl.call_args.args[0]
+        mock_get_cache.return_value.incr.assert_called_once_with(key, -1)
+
+    @patch("app.services.instance_service.encrypt_api_key", return_value="enc")
+    @patch("app.services.instance_service.get_cache")
+    @patch("app.services.instance_service.PlanConfiguration.get_plan", return_value={"name": "Pro", "max_instances": 5})
+    def test_paid_creation_skips_daily_limit(self, mock_plan, mock_get_cache, mock_encrypt, instance_service):
+        """Only free users are counted against the daily creation limit"""
+        user = MagicMock(spec=User, is_tester=False, plan_tier="pro", instance_count=1)
+        db = MagicMock(spec=Session)
+        db.get.return_value = user
+
+        instance_service.create_instance(db, "user_1", "Prod", "https://n8n.example.com", "key")
+
+        mock_get_cache.assert_not_called()
+        db.commit.assert_called_once()
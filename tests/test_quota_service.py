@@ -0,0 +1,53 @@
+"""
+Tests for quota service - daily quota increments
+"""
+
+import pytest
+from unittest.mock import MagicMock, patch
+from sqlalchemy.orm import Session
+
+from app.models.user import User
+from app.services.quota_service import QuotaService
+
+
+@pytest.fixture
+def mock_db():
+    """Create a mock database session"""
+    return MagicMock(spec=Session)
+
+
+@pytest.fixture
+def mock_pro_user():
+    """Create a mock pro tier user"""
+    user = MagicMock(spec=User)
+    user.id = "pro_user_123"
+    user.plan_tier = "pro"
+    user.is_tester = False
+    return user
+
+
+class TestIncrementQuota:
+    """Test cases for atomic quota increments"""
+
+    @patch("app.services.quota_service.get_cache")
+    @patch("app.services.quota_service.AnalyticsService")
+    def test_increment_is_single_upsert(self, mock_analytics, mock_get_cache, mock_db, mock_pro_user):
+        """Increment runs one INSERT ... ON CONFLICT without a Redis lock"""
+        mock_db.execute.return_value.scalar_one.return_value = 3
+
+        QuotaService().increment_quota(mock_db, mock_pro_user.id, "toggles", user=mock_pro_user)
+
+        mock_db.execute.assert_called_once()
+        sql = str(mock_db.execute.call_args.args[0])
+        assert "ON CONFLICT ON CONSTRAINT uq_quota_daily DO UPDATE" in sql
+        mock_db.commit.assert_called_once()
+        mock_get_cache.return_value.acquire_lock.assert_not_called()
+
+    @patch("app.services.quota_service.AnalyticsService")
+    def test_tester_increment_skipped(self, mock_analytics, mock_db, mock_pro_user):
+        """Testers have unlimited access, so nothing is written"""
+        mock_pro_user.is_tester = True
+
+        QuotaService().increment_quota(mock_db, mock_pro_user.id, "toggles", user=mock_pro_user)
+
+        mock_db.execute.assert_not_called()
@@ -0,0 +1,64 @@
+"""
+Tests for rate limit middleware - local request counting
+"""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.core.rate_limit_middleware import LOCAL_SYNC_EVERY, RATE_LIMITS, LocalRateCounter, RateLimitMiddleware
+
+
+@pytest.fixture
+def mock_cache():
+    """Create a mock cache that echoes the increment as the Redis total"""
+    cache = MagicMock()
+    cache.incr_with_ttl.side_effect = lambda key, amount, ttl: amount
+    return cache
+
+
+class TestLocalRateCounter:
+    """Test cases for batched Redis syncing of rate limit counters"""
+
+    def test_syncs_first_hit_then_every_batch(self, mock_cache):
+        """First hit seeds from Redis, later hits sync in batches"""
+        counter = LocalRateCounter(mock_cache, ttl_seconds=60)
+
+        for _ in range(LOCAL_SYNC_EVERY + 1):
+            counter.hit("k", "w1")
+
+        assert mock_cache.incr_with_ttl.call_count == 2
+        mock_cache.incr_with_ttl.assert_called_with("k", LOCAL_SYNC_EVERY, 60)
+        assert counter.count("k", "w1") == LOCAL_SYNC_EVERY + 1
+
+    def test_window_rollover_resets_counts(self, mock_cache):
+        """Counts from a previous window are discarded"""
+        counter = LocalRateCounter(mock_cache, ttl_seconds=60)
+        counter.hit("k", "w1")
+
+        assert counter.count("k", "w2") == 0
+
+    def test_redis_unavailable_keeps_local_count(self, mock_cache):
+        """Requests are still counted locally when Redis is down"""
+        mock_cache.incr_with_ttl.side_effect = None
+        mock_cache.incr_with_ttl.return_value = None
+        counter = LocalRateCounter(mock_cache, ttl_seconds=60)
+
+        counter.hit("k", "w1")
+        counter.hit("k", "w1")
+
+        assert counter.count("k", "w1") == 2
+
+
+class TestRemainingRequests:
+    """Test cases for the X-RateLimit-Remaining value"""
+
+    def test_remaining_excludes_request_in_flight(self, mock_cache):
+        """Remaining counts the current request as used"""
+        with patch("app.core.rate_limit_middleware.get_cache", return_value=mock_cache):
+            middleware = RateLimitMiddleware(MagicMock())
+        middleware.minute_counter.count = MagicMock(return_value=5)
+
+        remaining = middleware._get_remaining_requests("user_1", "free")
+
+        assert remaining == RATE_LIMITS["free"]["per_minute"] - 5 - 1
@@ -0,0 +1,30 @@
+"""
+Tests for RedisCache - connection handling
+"""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.core.redis_cache import RedisCache
+
+
+@pytest.fixture
+def cache():
+    """Create a RedisCache with a mocked, already-connected client"""
+    cache = RedisCache()
+    cache._client = MagicMock()
+    cache._connected = True
+    return cache
+
+
+class TestConnection:
+    """Test cases for lazy connection handling"""
+
+    def test_connected_client_is_reused_without_ping(self, cache):
+        """An established connection is not pinged before each operation"""
+        cache._client.get.return_value = None
+
+        cache.get("a")
+
+        cache._client.ping.assert_not_called()
@@ -0,0 +1,51 @@
+"""
+Tests for security helpers - API key decryption
+"""
+
+from unittest.mock import patch
+
+import pytest
+from cryptography.fernet import Fernet, InvalidToken
+
+from app.core import security
+
+
+@pytest.fixture(autouse=True)
+def clear_decrypt_cache():
+    """Start every test with an empty decryption cache"""
+    security._decrypt_cached.cache_clear()
+    yield
+    security._decrypt_cached.cache_clear()
+
+
+@pytest.fixture
+def cipher():
+    """Use a freshly generated Fernet key instead of the configured one"""
+    cipher = Fernet(Fernet.generate_key())
+    with patch("app.core.security.get_cipher", return_value=cipher):
+        yield cipher
+
+
+class TestDecryptApiKey:
+    """Test cases for cached API key decryption"""
+
+    def test_repeat_decryptions_are_cached(self, cipher):
+        """The same ciphertext is only decrypted once"""
+        encrypted = security.encrypt_api_key("n8n-key")
+
+        assert security.decrypt_api_key(encrypted) == "n8n-key"
+        assert security.decrypt_api_key(encrypted) == "n8n-key"
+        assert security._decrypt_cached.cache_info().hits == 1
+
+    def test_rotated_key_is_decrypted_fresh(self, cipher):
+        """A new ciphertext for the instance misses the cache"""
+        security.decrypt_api_key(security.encrypt_api_key("old-key"))
+
+        assert security.decrypt_api_key(security.encrypt_api_key("new-key")) == "new-key"
+
+    def test_invalid_ciphertext_still_raises(self, cipher):
+        """Decryption failures are raised, not cached"""
+        with pytest.raises(InvalidToken):
+            security.decrypt_api_key("not-a-token")
+
+        assert security._decrypt_cached.cache_info().currsize == 0
@@ -0,0 +1,54 @@
+"""
+Tests for subscription service - plan and user plan caches
+"""
+
+import pytest
+from unittest.mock import MagicMock
+from sqlalchemy.orm import Session
+
+from app.models.plan import Plan
+from app.services.subscription_service import PlanConfiguration
+
+
+@pytest.fixture
+def mock_db():
+    """Create a mock database session returning the pro plan"""
+    plan = MagicMock(spec=Plan)
+    plan.name = "Pro"
+    plan.price_monthly = 19.99
+    plan.price_yearly = 199.99
+    plan.limits = {"toggles_per_day": 100, "push_notifications": True}
+    plan.features = ["Instant push notifications"]
+
+    db = MagicMock(spec=Session)
+    db.query.return_value.filter.return_value.first.return_value = plan
+    return db
+
+
+@pytest.fixture(autouse=True)
+def clear_plan_cache():
+    """Start every test with an empty plan cache"""
+    PlanConfiguration.invalidate_cache()
+    yield
+    PlanConfiguration.invalidate_cache()
+
+
+class TestPlanConfigurationCache:
+    """Test cases for in-process plan caching"""
+
+    def test_repeat_lookups_hit_cache(self, mock_db):
+        """Only the first lookup for a tier queries the database"""
+        first = PlanConfiguration.get_plan(mock_db, "pro")
+        limit = PlanConfiguration.get_limit(mock_db, "PRO", "toggles_per_day")
+
+        assert first["push_notifications"] is True
+        assert limit == 100
+        assert mock_db.query.call_count == 1
+
+    def test_invalidate_forces_reload(self, mock_db):
+        """Invalidating the cache makes the next lookup read the table again"""
+        PlanConfiguration.get_plan(mock_db, "pro")
+        PlanConfiguration.invalidate_cache()
+        PlanConfiguration.get_plan(mock_db, "pro")
+
+        assert mock_db.query.call_count == 2
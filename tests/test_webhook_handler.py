@@ -2,16 +2,35 @@
 Tests for webhook handler - specifically testing tester access to push notifications
 """
 
+import json
+
 import pytest
 from unittest.mock import MagicMock, patch, AsyncMock
-from fastapi import HTTPException
+from fastapi import BackgroundTasks, HTTPException
+from fastapi.exceptions import RequestValidationError
 from sqlalchemy.orm import Session
 
-from app.notifier.webhook_handler import handle_n8n_error, N8NErrorRequest, Severity
+from app.notifier.webhook_handler import (
+    _accepted_n8n_errors,
+    handle_google_play_notification,
+    handle_n8n_error,
+    parse_n8n_error_request,
+    N8NErrorRequest,
+    Severity,
+    process_google_play_notification,
+)
 from app.models.user import User
 from app.models.n8n_instance import N8NInstance
 
 
+@pytest.fixture(autouse=True)
+def clear_accepted_n8n_errors():
+    """Start every test without remembered webhook executions"""
+    _accepted_n8n_errors.clear()
+    yield
+    _accepted_n8n_errors.clear()
+
+
 @pytest.fixture
 def mock_db():
     """Create a mock database session"""
@@ -97,10 +116,9 @@ class TestWebhookHandlerTesterAccess:
         """Test that free tier user without tester status is rejected"""
         # Setup mocks
         mock_instance_service_instance = mock_instance_service.return_value
-        mock_instance_service_instance.get_instance_by_id.return_value = mock_instance
-
-        mock_db.query.return_value.filter.return_value.first.return_value = (
-            mock_free_user
+        mock_instance_service_instance.get_webhook_target.return_value = (
+            mock_instance,
+            mock_free_user,
         )
 
         # Free plan does not have push notifications
@@ -109,19 +127,26 @@ class TestWebhookHandlerTesterAccess:
             "name": "Free",
         }
 
-        # Execute and expect 403 error
-        with pytest.raises(HTTPException) as exc_info:
-            await handle_n8n_error(sample_error_request, mock_db)
+        # Execute and expect a 403 response
+        response = await handle_n8n_error(
+            BackgroundTasks(),
+            sample_error_request,
+            mock_db,
+            mock_instance_service.return_value,
+            mock_fcm_service.return_value,
+            mock_analytics.return_value,
+        )
 
-        # Verify exception
-        assert exc_info.value.status_code == 403
+        # Verify rejection
+        assert response.status_code == 403
         assert (
             "Push notifications are not available on the Free plan"
-            in exc_info.value.detail
+            in json.loads(response.body)["detail"]
         )
+        mock_analytics.return_value.log_failure.assert_called_once()
 
         # Verify FCM was not called
-        mock_fcm_service.assert_not_called()
+        mock_fcm_service.return_value.send_error_notification.assert_not_called()
 
     @pytest.mark.asyncio
     @patch("app.notifier.webhook_handler.InstanceService")
@@ -146,12 +171,9 @@ class TestWebhookHandlerTesterAccess:
         mock_tester_instance.enabled = True
 
         mock_instance_service_instance = mock_instance_service.return_value
-        mock_instance_service_instance.get_instance_by_id.return_value = (
-            mock_tester_instance
-        )
-
-        mock_db.query.return_value.filter.return_value.first.return_value = (
-            mock_tester_user
+        mock_instance_service_instance.get_webhook_target.return_value = (
+            mock_tester_instance,
+            mock_tester_user,
         )
 
         # Free plan does not have push notifications
@@ -170,15 +192,24 @@ class TestWebhookHandlerTesterAccess:
         mock_analytics_instance.log_failure = MagicMock()
 
         # Execute - should NOT raise exception for tester
-        result = await handle_n8n_error(sample_error_request, mock_db)
+        background_tasks = BackgroundTasks()
+        result = await handle_n8n_error(
+            background_tasks,
+            sample_error_request,
+            mock_db,
+            mock_instance_service.return_value,
+            mock_fcm_service.return_value,
+            mock_analytics.return_value,
+        )
 
         # Verify success response
         assert result["status"] == "success"
-        assert result["message"] == "Notification sent"
+        assert result["message"] == "Notification queued"
         assert result["user_id"] == "tester_user_123"
 
-        # Verify FCM notification was sent
-        mock_fcm_instance.send_error_notification.assert_called_once()
+        # Verify FCM notification was queued to run after the response
+        assert len(background_tasks.tasks) == 1
+        assert background_tasks.tasks[0].func is mock_fcm_instance.send_error_notification
 
         # Verify analytics logged success
         mock_analytics_instance.log_success.assert_called_once()
@@ -206,12 +237,9 @@ class TestWebhookHandlerTesterAccess:
         mock_pro_instance.enabled = True
 
         mock_instance_service_instance = mock_instance_service.return_value
-        mock_instance_service_instance.get_instance_by_id.return_value = (
-            mock_pro_instance
-        )
-
-        mock_db.query.return_value.filter.return_value.first.return_value = (
-            mock_pro_user
+        mock_instance_service_instance.get_webhook_target.return_value = (
+            mock_pro_instance,
+            mock_pro_user,
         )
 
         # Pro plan has push notifications
@@ -230,15 +258,27 @@ class TestWebhookHandlerTesterAccess:
         mock_analytics_instance.log_failure = MagicMock()
 
         # Execute - should NOT raise exception
-        result = await handle_n8n_error(sample_error_request, mock_db)
+        background_tasks = BackgroundTasks()
+        result = await handle_n8n_error(
+            background_tasks,
+            sample_error_request,
+            mock_db,
+            mock_instance_service.return_value,
+            mock_fcm_service.return_value,
+            mock_analytics.return_value,
+        )
 
         # Verify success response
         assert result["status"] == "success"
-        assert result["message"] == "Notification sent"
+        assert result["message"] == "Notification queued"
         assert result["user_id"] == "pro_user_123"
 
-        # Verify FCM notification was sent
-        mock_fcm_instance.send_error_notification.assert_called_once()
+        # Verify the session was released once the lookups finished
+        mock_db.close.assert_called_once()
+
+        # Verify FCM notification was queued to run after the response
+        assert len(background_tasks.tasks) == 1
+        assert background_tasks.tasks[0].func is mock_fcm_instance.send_error_notification
 
         # Verify analytics logged success
         mock_analytics_instance.log_success.assert_called_once()
@@ -264,18 +304,105 @@ class TestWebhookHandlerTesterAccess:
         mock_disabled_instance.enabled = False  # Disabled
 
         mock_instance_service_instance = mock_instance_service.return_value
-        mock_instance_service_instance.get_instance_by_id.return_value = (
-            mock_disabled_instance
-        )
-
-        mock_db.query.return_value.filter.return_value.first.return_value = (
-            mock_tester_user
+        mock_instance_service_instance.get_webhook_target.return_value = (
+            mock_disabled_instance,
+            mock_tester_user,
         )
 
         # Execute and expect 403 error
         with pytest.raises(HTTPException) as exc_info:
-            await handle_n8n_error(sample_error_request, mock_db)
+            await handle_n8n_error(
+                BackgroundTasks(),
+                sample_error_request,
+                mock_db,
+                mock_instance_service.return_value,
+                MagicMock(),
+                mock_analytics.return_value,
+            )
 
         # Verify exception
         assert exc_info.value.status_code == 403
         assert "Instance is disabled" in exc_info.value.detail
+
+
+class TestWebhookRetries:
+    """Test cases for n8n webhook retry deduplication"""
+
+    @pytest.mark.asyncio
+    @patch("app.notifier.webhook_handler.PlanConfiguration")
+    async def test_retry_returns_original_response_without_lookups(
+        self,
+        mock_plan_config,
+        mock_db,
+        mock_pro_user,
+        mock_instance,
+        sample_error_request,
+    ):
+        """A retried execution is answered from memory and not pushed twice"""
+        instance_service = MagicMock()
+        instance_service.get_webhook_target.return_value = (mock_instance, mock_pro_user)
+        fcm_service = MagicMock()
+        mock_plan_config.get_plan.return_value = {"push_notifications": True}
+
+        first_tasks = BackgroundTasks()
+        first = await handle_n8n_error(
+            first_tasks, sample_error_request, mock_db, instance_service, fcm_service, MagicMock()
+        )
+        retry_tasks = BackgroundTasks()
+        retry = await handle_n8n_error(
+            retry_tasks, sample_error_request, mock_db, instance_service, fcm_service, MagicMock()
+        )
+
+        assert retry == first
+        assert len(first_tasks.tasks) == 1
+        assert retry_tasks.tasks == []
+        instance_service.get_webhook_target.assert_called_once()
+
+
+class TestParseN8NErrorRequest:
+    """Test cases for webhook body parsing"""
+
+    @pytest.mark.asyncio
+    async def test_parses_raw_body(self):
+        """Valid JSON bytes are validated straight into the request model"""
+        raw_request = MagicMock()
+        raw_request.body = AsyncMock(
+            return_value=b'{"executionId": "e1", "workflowId": "w1", "instanceId": "i1", "severity": "critical"}'
+        )
+
+        parsed = await parse_n8n_error_request(raw_request)
+
+        assert parsed.instanceId == "i1"
+        assert parsed.severity == "critical"
+
+    @pytest.mark.asyncio
+    async def test_missing_field_raises_validation_error(self):
+        """Invalid bodies get FastAPI's standard 422 validation error"""
+        raw_request = MagicMock()
+        raw_request.body = AsyncMock(return_value=b'{"executionId": "e1"}')
+
+        with pytest.raises(RequestValidationError) as exc_info:
+            await parse_n8n_error_request(raw_request)
+
+        assert ("body", "instanceId") in [tuple(err["loc"]) for err in exc_info.value.errors()]
+
+
+class TestBillingWebhooks:
+    """Test cases for store notification webhooks"""
+
+    @pytest.mark.asyncio
+    async def test_google_play_acknowledged_before_processing(self):
+        """The raw body is handed to a background task and acknowledged at once"""
+        raw_request = MagicMock()
+        raw_request.body = AsyncMock(return_value=b'{"message": {"data": {}}}')
+        background_tasks = BackgroundTasks()
+
+        result = await handle_google_play_notification(raw_request, background_tasks)
+
+        assert result["status"] == "acknowledged"
+        assert background_tasks.tasks[0].func is process_google_play_notification
+        assert background_tasks.tasks[0].args == (b'{"message": {"data": {}}}',)
+
+    def test_invalid_payload_is_logged_not_raised(self):
+        """Processing failures happen after the ack and must not raise"""
+        process_google_play_notification(b"not json")